@@ -0,0 +1,218 @@
+"""
+Asyncio runtime of the bot (WNW_BOT_MODE=async or python async_bot.py).
+
+Network I/O to Telegram and the weather API runs on the event loop, so a single process keeps
+thousands of conversations open without a thread each. Blocking steps (spaCy, langdetect, gTTS,
+speech recognition, PIL) run in a bounded thread pool. Features without an async version yet are
+answered by the synchronous handlers of telegram_bot, run in the same pool with the sync bot
+(sync bridge), so their replies, dialogs and callbacks keep working unchanged.
+"""
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import aiohttp
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from wnw_bot_api_token import token as api_token
+from intents import IntentRequest
+from storage import exit_on_sigterm
+import forecast_chart
+import intent_detection
+import speech_to_text
+import telegram_bot
+import text_to_speech
+import weather
+
+# Threads for blocking steps and synchronous handlers
+ASYNC_BLOCKING_WORKERS = 32
+# Timeout in seconds for requests to the weather API
+ASYNC_HTTP_TIMEOUT = 10
+
+bot = AsyncTeleBot(api_token)
+# Synchronous bot with the registered sync handlers, used by the sync bridge
+sync_bot = telegram_bot.bot
+intents = telegram_bot.intents
+blocking_executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix="async-blocking")
+_http_session = None
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Runs a blocking function in the thread pool and waits for its result without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, partial(fn, *args, **kwargs))
+
+
+def http_session():
+    """
+    Returns the shared aiohttp session (connection pooling for the weather API), created on first use.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=ASYNC_HTTP_TIMEOUT))
+    return _http_session
+
+
+def _run_on_loop(loop, method, *args, **kwargs):
+    try:
+        return asyncio.run_coroutine_threadsafe(method(*args, **kwargs), loop).result()
+    except (aiohttp.ClientError, asyncio.TimeoutError, asyncio_helper.RequestTimeout) as e:
+        # asyncio_helper wraps the aiohttp error in RequestTimeout. Only a failed connect becomes the
+        # ConnectionError the outbound queue retries, after a read timeout the message may already be sent
+        cause = e.__cause__ if isinstance(e, asyncio_helper.RequestTimeout) else e
+        if isinstance(cause, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)):
+            raise ConnectionError(f"{method.__name__} failed: {cause!r}") from e
+        raise
+
+
+async def send(chat_id, method, *args, **kwargs):
+    """
+    Calls a send method of the async bot through the outbound queue of the sync bot, so both bots share
+    the rate limits and lanes (see outbound.py). Every attempt runs a fresh coroutine on this event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.wrap_future(sync_bot.outbound.submit(chat_id, _run_on_loop, loop, method, *args, **kwargs))
+
+
+def _has_next_step(message):
+    # Dialogs of the sync handlers (e.g. adding a wardrobe item) wait for the next message of the chat
+    handlers = getattr(sync_bot.next_step_backend, "handlers", {})
+    return message.chat.id in handlers
+
+
+async def send_reply_with_tts_button(message, reply_text, lang):
+    keyboard = InlineKeyboardMarkup()
+    keyboard.add(InlineKeyboardButton("🔊 Vorlesen", callback_data=f"tts|{lang}"))
+    await send(message.chat.id, bot.send_message, message.chat.id, reply_text, reply_markup=keyboard)
+
+
+async def answer(message, text, language, not_understood):
+    """
+    Answers a text (typed or transcribed): weather natively async, every other intent via the sync bridge.
+    Both are timed in the intent registry of telegram_bot.
+    """
+    intent = await run_blocking(intent_detection.detect_intent, text, language)
+    print("Intent: " + str(intent))
+    if intent == "weather":
+        # Same needs and metrics as the weather intent of the registry, only the API call is async
+        request = IntentRequest(intents, message, text, language)
+        with intents.measure(intent):
+            location = await run_blocking(request.need, "location")
+            forecast_day, error = await run_blocking(weather.check_weather_request, text, language, location)
+            if error:
+                response = error
+            else:
+                result = await weather.get_weather_async(http_session(), location, language, forecast_day)
+                response = weather.format_weather_reply(result, location)
+        await send_reply_with_tts_button(message, response, language)
+        return
+    await run_blocking(telegram_bot.answer_intent, message, text, language, intent, not_understood)
+
+
+@bot.message_handler(commands=["start"])
+async def handle_start(message):
+    await run_blocking(telegram_bot.handle_command, message)
+
+
+@bot.message_handler(commands=["help", "hilfe"])
+async def handle_help(message):
+    await run_blocking(telegram_bot.handle_help, message)
+
+
+@bot.message_handler(commands=["kleiderschrank", "Kleiderschrank", "wardrobe", "Wardrobe"])
+async def handle_wardrobe_menu(message):
+    await run_blocking(telegram_bot.handle_wardrobe_menu, message)
+
+
+@bot.message_handler(commands=["routines"])
+async def handle_routines(message):
+    await run_blocking(telegram_bot.handle_routines, message)
+
+
+@bot.message_handler(content_types=["text"])
+async def handle_text(message):
+    if _has_next_step(message):
+        await run_blocking(sync_bot.process_new_messages, [message])
+        return
+    text = message.text
+    language = await run_blocking(speech_to_text.detect_language, text)
+    if language is None:
+        await send(message.chat.id, bot.reply_to, message, "Es tut mir leid, ich kann nur Deutsch oder Englisch verstehen. Bitte versuche es erneut.\n Sorry I can only understand German or English. Please try again.")
+        return
+    await answer(message, text, language, telegram_bot.not_understood_text(language))
+
+
+@bot.message_handler(content_types=["voice"])
+async def handle_voice(message):
+    text, language = await speech_to_text.transcribe_voice_async(bot, message, executor=blocking_executor)
+    if text:
+        print(f"Input: {text}, Language: {language}")
+        await answer(message, text, language, telegram_bot.not_understood_text(language, text))
+    else:
+        await send(message.chat.id, bot.reply_to, message, "Sorry, I couldn't understand your voice message.")
+
+
+@bot.message_handler(content_types=["location", "venue"])
+async def handle_location_or_venue(message):
+    await run_blocking(telegram_bot.handle_location_or_venue, message)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("tts|"))
+async def handle_tts_callback(call):
+    lang = call.data.split("|", 1)[1]
+    chat_id = call.message.chat.id
+    text = call.message.text
+    # Same cache as the sync handler (telegram_bot.send_tts_voice): file_id first, then cached or new audio
+    key = text_to_speech.tts_key(text, lang)
+    cache = await run_blocking(text_to_speech.get_tts_cache)
+    file_id = cache.get_file_id(key)
+    rejected = False
+    if file_id:
+        # Uploaded again only if Telegram rejects the file_id: a send without a result was still handled
+        try:
+            await send(chat_id, bot.send_voice, chat_id, file_id)
+        except asyncio_helper.ApiTelegramException as e:
+            print(f"Cached voice rejected, uploading again: {e}")
+            cache.set_file_id(key, None)
+            rejected = True
+    if not file_id or rejected:
+        audio = await text_to_speech.speech_ogg_async(text, lang=lang, executor=blocking_executor)
+        sent = await send(chat_id, bot.send_voice, chat_id, io.BytesIO(audio))
+        if sent is not None and sent.voice:
+            cache.set_file_id(key, sent.voice.file_id)
+    await bot.answer_callback_query(call.id)
+
+
+@bot.callback_query_handler(func=lambda call: True)
+async def handle_other_callbacks(call):
+    # Wardrobe dialogs, routine deletion, help pages and weather charts: sync handlers via the bridge
+    await run_blocking(sync_bot.process_new_callback_query, [call])
+
+
+async def run():
+    try:
+        await bot.delete_webhook()
+        await bot.infinity_polling()
+    finally:
+        if _http_session is not None:
+            await _http_session.close()
+        await bot.close_session()
+
+
+def main():
+    # Flush the write-behind stores when the process is stopped
+    exit_on_sigterm()
+    telegram_bot.register_commands()
+    # Fork the chart renderers before any thread of the bot runs
+    forecast_chart.render_pool.start()
+    telegram_bot.start_background_services(sync_bot)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
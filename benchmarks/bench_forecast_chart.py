@@ -0,0 +1,84 @@
+"""
+Benchmark of the forecast chart rendering: preloaded assets and in-memory PNG against
+loading every asset per call and going through a file on disk (the former callback).
+
+Run from the repository root:
+    python benchmarks/bench_forecast_chart.py
+"""
+import os
+import sys
+import tempfile
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+
+import forecast_chart
+
+FORECAST = [
+    {"day": "Heute", "temp": 12.4, "desc": "Leichter Regenfall"},
+    {"day": "Morgen", "temp": 9.8, "desc": "Bewölkt"},
+    {"day": "Übermorgen", "temp": 15.1, "desc": "Sonnig"},
+]
+
+
+def legacy_render(location, forecast_data, lang, directory):
+    assets_dir = forecast_chart.ASSETS_DIR
+    base_image = Image.open(os.path.join(assets_dir, forecast_chart.BACKGROUNDS[lang])).convert("RGBA")
+    draw = ImageDraw.Draw(base_image)
+    font_large = ImageFont.truetype(os.path.join(assets_dir, "fonts", "Roboto-Bold.ttf"), 40)
+    font_small = ImageFont.truetype(os.path.join(assets_dir, "fonts", "Roboto-Regular.ttf"), 25)
+
+    card_width = base_image.width // 3
+    draw.text((card_width + 70, 50), f"{location}", font=font_large, fill="black")
+    for i, forecast in enumerate(forecast_data):
+        x = i * card_width + forecast_chart.TEXT_X_OFFSETS[i]
+        y = 800
+        icon_path = os.path.join(assets_dir, "icons", forecast_chart.get_weather_icon_name(forecast["desc"]) + ".png")
+        if os.path.exists(icon_path):
+            icon = Image.open(icon_path).convert("RGBA").resize(forecast_chart.ICON_SIZE)
+            base_image.paste(icon, (x - forecast_chart.ICON_X_OFFSETS[i], 340), icon)
+        draw.text((x, y), f"{forecast['temp']}°C", font=font_large, fill="black")
+        draw.text((x, y + 60), forecast["desc"], font=font_small, fill="black")
+
+    image_path = os.path.join(directory, f"{location}_forecast.png")
+    base_image.save(image_path)
+    with open(image_path, "rb") as photo:
+        data = photo.read()
+    os.remove(image_path)
+    return data
+
+
+def main():
+    runs = 30
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = timeit.timeit(lambda: legacy_render("Ulm", FORECAST, "de", directory), number=runs) / runs
+        legacy_size = len(legacy_render("Ulm", FORECAST, "de", directory))
+    preloaded = timeit.timeit(lambda: forecast_chart.render_forecast("Ulm", FORECAST, "de"), number=runs) / runs
+    size = len(forecast_chart.render_forecast("Ulm", FORECAST, "de"))
+    load = timeit.timeit(forecast_chart.ChartAssets, number=5) / 5
+
+    print(f"legacy (load assets, disk)    {legacy * 1000:7.1f} ms   {1 / legacy:6.1f} renders/s   {legacy_size / 1024:6.0f} KiB")
+    print(f"preloaded (in memory)         {preloaded * 1000:7.1f} ms   {1 / preloaded:6.1f} renders/s   {size / 1024:6.0f} KiB")
+    print(f"speedup {legacy / preloaded:.1f}x, one-time asset load {load * 1000:.1f} ms")
+
+    # Concurrent requests on the render pool (the callbacks run on several dispatcher threads)
+    pool = forecast_chart.render_pool
+    started = time.perf_counter()
+    pool.start()
+    warm_up = time.perf_counter() - started
+    renders = 60
+    with ThreadPoolExecutor(max_workers=max(1, pool.workers) * 2) as threads:
+        started = time.perf_counter()
+        list(threads.map(lambda i: pool.render(f"Ulm {i}", FORECAST, "de"), range(renders)))
+        elapsed = time.perf_counter() - started
+    pool.shutdown()
+    print(f"render pool ({pool.workers} workers)      {elapsed / renders * 1000:7.1f} ms   {renders / elapsed:6.1f} renders/s"
+          f"   (start and warm-up {warm_up * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
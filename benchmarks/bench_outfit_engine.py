@@ -0,0 +1,98 @@
+"""
+Benchmark of the NumPy outfit engine against the list-comprehension matching on synthetic wardrobes.
+
+Run from the repository root:
+    python benchmarks/bench_outfit_engine.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import outfit_engine
+from clothing import ClothingItem
+
+WEATHER_TYPES = ["sunny", "rain", "snow", "cloudy", "any"]
+CATEGORIES = ["Tops", "Pants", "Jackets", "Shoes", "Accessories"]
+
+
+def synthetic_wardrobe(n_items, rng):
+    wardrobe = {cat: [] for cat in CATEGORIES}
+    for i in range(n_items):
+        low = rng.randint(-30, 30)
+        wardrobe[CATEGORIES[i % len(CATEGORIES)]].append(ClothingItem(
+            f"item{i}", low, low + rng.randint(5, 30), rng.randint(1, 10),
+            rng.sample(WEATHER_TYPES, rng.randint(1, 2)),
+        ))
+    return wardrobe
+
+
+def python_suggest(wardrobe, temp, weather_type):
+    result = {}
+    for cat, items in wardrobe.items():
+        filtered = [i for i in items if i.fits(temp, weather_type)]
+        if filtered:
+            best = min(i.prio for i in filtered)
+            result[cat] = tuple(i.name for i in filtered if i.prio == best)
+        else:
+            result[cat] = ()
+    return result
+
+
+def python_cover(wardrobe, temps, weather_types, prio_weight=0.1):
+    result = {}
+    for cat, items in wardrobe.items():
+        chosen = []
+        if items:
+            low, high = min(i.prio for i in items), max(i.prio for i in items)
+            fits = [{k for k, (t, w) in enumerate(zip(temps, weather_types)) if i.fits(t, w)} for i in items]
+            uncovered = set().union(*fits)
+            while uncovered:
+                scores = [len(f & uncovered) / (1 + prio_weight * (i.prio - low) / (high - low + 1))
+                          for i, f in zip(items, fits)]
+                best = max(range(len(items)), key=lambda k: (scores[k], -k))
+                chosen.append(items[best].name)
+                uncovered -= fits[best]
+        result[cat] = chosen
+    return result
+
+
+def report(label, python_seconds, engine_seconds, runs):
+    print(f"{label:<32} python {python_seconds / runs * 1000:8.3f} ms   numpy {engine_seconds / runs * 1000:8.3f} ms"
+          f"   speedup {python_seconds / engine_seconds:5.1f}x")
+
+
+def main():
+    rng = random.Random(42)
+    wardrobe = synthetic_wardrobe(10_000, rng)
+    arrays = outfit_engine.WardrobeArrays.from_wardrobe(wardrobe)
+    assert outfit_engine.suggest(arrays, 12, "rain") == python_suggest(wardrobe, 12, "rain")
+
+    runs = 50
+    report("single day, 10k items",
+           timeit.timeit(lambda: python_suggest(wardrobe, 12, "rain"), number=runs),
+           timeit.timeit(lambda: outfit_engine.suggest(arrays, 12, "rain"), number=runs), runs)
+
+    # 30-day trip, a cold morning and a warm afternoon per day
+    temps = [rng.randint(-10, 10) for _ in range(30)] + [rng.randint(10, 30) for _ in range(30)]
+    weathers = [rng.choice(WEATHER_TYPES[:4]) for _ in temps]
+    assert outfit_engine.cover(arrays, temps, weathers)[0] == python_cover(wardrobe, temps, weathers)
+    report("30-day cover, 10k items",
+           timeit.timeit(lambda: python_cover(wardrobe, temps, weathers), number=5) * runs / 5,
+           timeit.timeit(lambda: outfit_engine.cover(arrays, temps, weathers), number=runs), runs)
+
+    users = [synthetic_wardrobe(50, rng) for _ in range(200)]
+    many = outfit_engine.WardrobeArrays.from_wardrobes(users)
+    assert outfit_engine.suggest_many(many, 5, "snow") == [python_suggest(w, 5, "snow") for w in users]
+    report("200 users x 50 items (10k)",
+           timeit.timeit(lambda: [python_suggest(w, 5, "snow") for w in users], number=runs),
+           timeit.timeit(lambda: outfit_engine.suggest_many(many, 5, "snow"), number=runs), runs)
+
+    build = timeit.timeit(lambda: outfit_engine.WardrobeArrays.from_wardrobe(wardrobe), number=5) / 5
+    print(f"array build, 10k items: {build * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field, replace
+
+# Weather types of the wardrobe items as bits, so matching a set of weather types is a single AND
+WEATHER_BITS = {"sunny": 1, "rain": 2, "snow": 4, "cloudy": 8, "any": 16}
+ANY_BIT = WEATHER_BITS["any"]
+
+# Fields of a clothing item besides its name, in JSON order
+ITEM_FIELDS = ("min_temp", "max_temp", "prio", "weather")
+
+
+def normalize_name(name):
+    """
+    Normalizes a clothing item name for lookups ("  T-Shirt " and "t-shirt" are the same item).
+    """
+    return " ".join(str(name).split()).casefold()
+
+
+def weather_mask(weather):
+    """
+    Converts a weather value (list of types, legacy string, or already a bitmask) to a bitmask.
+    Unknown weather types are ignored, an empty value counts as 'any'.
+    """
+    if isinstance(weather, int):
+        return weather or ANY_BIT
+    if not weather:
+        return ANY_BIT
+    if isinstance(weather, str):
+        weather = [weather]
+    mask = 0
+    for w in weather:
+        mask |= WEATHER_BITS.get(w, 0)
+    return mask or ANY_BIT
+
+
+def weather_types(mask):
+    """
+    Converts a weather bitmask back to the list of weather types (JSON form).
+    """
+    return [name for name, bit in WEATHER_BITS.items() if mask & bit]
+
+
+@dataclass(slots=True)
+class ClothingItem:
+    """
+    A single wardrobe item.
+    The weather is stored as a bitmask (see WEATHER_BITS) and `key` is the normalized name used for lookups.
+    """
+    name: str
+    min_temp: int = 10
+    max_temp: int = 25
+    prio: int = 3
+    weather: int = ANY_BIT
+    key: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.weather = weather_mask(self.weather)
+        self.key = normalize_name(self.name)
+
+    def fits(self, temp, weather_type):
+        """
+        Checks whether the item fits the temperature and the weather type of a forecast.
+        """
+        return self.min_temp <= temp <= self.max_temp and bool(self.weather & (ANY_BIT | WEATHER_BITS.get(weather_type, 0)))
+
+    def has_weather(self, weather_type):
+        return bool(self.weather & WEATHER_BITS.get(weather_type, 0))
+
+    def to_dict(self):
+        """
+        Returns the JSON form of the item, with the weather as a list of types.
+        """
+        return {"name": self.name, "min_temp": self.min_temp, "max_temp": self.max_temp,
+                "prio": self.prio, "weather": weather_types(self.weather)}
+
+    def copy(self, **changes):
+        return replace(self, **changes)
+
+    @classmethod
+    def from_value(cls, value):
+        """
+        Builds an item from its stored form. Handles the legacy forms as well:
+        a plain string (name only) and a weather given as a single string instead of a list.
+        """
+        if isinstance(value, ClothingItem):
+            return value
+        if isinstance(value, str):
+            return cls(value)
+        return cls(value["name"],
+                   value.get("min_temp", 10),
+                   value.get("max_temp", 25),
+                   value.get("prio", 3),
+                   value.get("weather", "any"))
+
+
+def is_legacy_item(value):
+    """
+    Checks whether a stored item still uses a legacy form (plain string or weather string).
+    """
+    return isinstance(value, str) or not isinstance(value.get("weather"), list)
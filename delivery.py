@@ -0,0 +1,159 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import outbound
+
+# Number of threads sending routine and reminder messages
+DELIVERY_WORKERS = 8
+# Maximum number of deliveries waiting for a worker. When the queue is full, producers
+# (routine slot jobs, the reminder thread) block instead of piling up more threads.
+DELIVERY_QUEUE_SIZE = 500
+# How long a producer waits for a free queue slot before the delivery is dropped
+DELIVERY_SUBMIT_TIMEOUT = 30
+# Interval in seconds for logging the delivery metrics (only while there is traffic)
+DELIVERY_METRICS_INTERVAL = 60
+# Number of recent deliveries used for the lag statistics
+LAG_WINDOW = 1000
+
+
+class DeliveryExecutor:
+    """
+    Fixed-size worker pool with a bounded queue for outgoing routine and reminder messages.
+
+    Producers hand over a callable with submit(); when all workers are busy and the queue is full,
+    submit() blocks (backpressure) until a slot frees up or the timeout expires.
+    The executor keeps counters and the queueing lag (time between submit and start of execution)
+    so the worker count can be sized against the real routine peak.
+    """
+
+    def __init__(self, workers=DELIVERY_WORKERS, queue_size=DELIVERY_QUEUE_SIZE, name="delivery"):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.name = name
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self._max_lag = 0.0
+        self._max_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self._started = False
+
+    def start(self):
+        """
+        Starts the worker threads and the metrics reporter. Calling it again has no effect.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self._report, name=f"{self.name}-metrics", daemon=True).start()
+
+    def submit(self, fn, *args, timeout=DELIVERY_SUBMIT_TIMEOUT, **kwargs):
+        """
+        Queues fn(*args, **kwargs) for delivery.
+
+        Args:
+            fn: The callable to run on a delivery worker.
+            timeout (float): Seconds to wait for a free queue slot, None waits forever.
+
+        Returns:
+            bool: True if the delivery was queued, False if it was dropped because the queue stayed full.
+        """
+        if not self._started:
+            self.start()
+        try:
+            self._queue.put((time.monotonic(), fn, args, kwargs), timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            print(f"[{self.name}] Queue full ({self.queue_size}), delivery dropped: {getattr(fn, '__name__', fn)}")
+            return False
+        with self._lock:
+            self.submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    def _work(self):
+        # Everything sent from here is a scheduled push, interactive replies go first (see outbound.py)
+        with outbound.scheduled():
+            self._work_forever()
+
+    def _work_forever(self):
+        while True:
+            enqueued, fn, args, kwargs = self._queue.get()
+            lag = time.monotonic() - enqueued
+            with self._lock:
+                self._lags.append(lag)
+                self._max_lag = max(self._max_lag, lag)
+            try:
+                fn(*args, **kwargs)
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"[{self.name}] Delivery failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def metrics(self):
+        """
+        Returns a snapshot of the executor metrics.
+
+        Returns:
+            dict: workers, queue size and depth, counters and lag statistics (seconds).
+        """
+        with self._lock:
+            lags = sorted(self._lags)
+            snapshot = {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "lag_avg": sum(lags) / len(lags) if lags else 0.0,
+                "lag_p95": lags[int(len(lags) * 0.95) - 1] if lags else 0.0,
+                "lag_max": self._max_lag,
+            }
+        return snapshot
+
+    def format_metrics(self):
+        """
+        Returns the metrics as a single log line.
+        """
+        m = self.metrics()
+        return (f"[{self.name}] depth {m['queue_depth']}/{m['queue_size']} (max {m['max_queue_depth']}), "
+                f"workers {m['workers']}, submitted {m['submitted']}, completed {m['completed']}, "
+                f"failed {m['failed']}, dropped {m['dropped']}, "
+                f"lag avg {m['lag_avg']:.2f}s p95 {m['lag_p95']:.2f}s max {m['lag_max']:.2f}s")
+
+    def _report(self):
+        last_submitted = 0
+        while True:
+            time.sleep(DELIVERY_METRICS_INTERVAL)
+            if self.submitted != last_submitted or self._queue.qsize():
+                print(self.format_metrics())
+                last_submitted = self.submitted
+
+    def join(self):
+        """
+        Blocks until all queued deliveries are processed.
+        """
+        self._queue.join()
+
+
+# Shared executor for routine and reminder deliveries
+executor = DeliveryExecutor()
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import telebot
+
+# Number of worker queues (and threads) processing incoming updates. All updates of a chat
+# land on the same queue, so they are handled strictly in order; different chats run in parallel.
+DISPATCH_WORKERS = 8
+# Maximum number of updates waiting per queue. When a queue is full, the poller blocks (backpressure).
+DISPATCH_QUEUE_SIZE = 100
+# Interval in seconds for logging the dispatcher metrics (only while there is traffic)
+DISPATCH_METRICS_INTERVAL = 60
+# Number of recent updates per queue used for the latency statistics
+LATENCY_WINDOW = 500
+
+# Update fields that carry a chat (or at least a user) to order by
+UPDATE_FIELDS = (
+    "message", "edited_message", "channel_post", "edited_channel_post", "business_message",
+    "edited_business_message", "callback_query", "inline_query", "chosen_inline_result",
+    "shipping_query", "pre_checkout_query", "poll_answer", "my_chat_member", "chat_member",
+    "chat_join_request", "message_reaction", "chat_boost",
+)
+
+
+def update_chat_id(update):
+    """
+    Returns the id the update is ordered by: the chat of the update, the user for chat-less updates
+    (inline queries, poll answers) and the update id if there is neither.
+    """
+    for name in UPDATE_FIELDS:
+        obj = getattr(update, name, None)
+        if obj is None:
+            continue
+        chat = getattr(obj, "chat", None) or getattr(getattr(obj, "message", None), "chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(obj, "from_user", None) or getattr(obj, "user", None)
+        if user is not None:
+            return user.id
+    return update.update_id
+
+
+class _ChatQueue:
+    """
+    One worker queue with its thread and latency statistics.
+    """
+
+    def __init__(self, index, queue_size):
+        self.index = index
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.waits = deque(maxlen=LATENCY_WINDOW)
+        self.durations = deque(maxlen=LATENCY_WINDOW)
+        self.max_wait = 0.0
+        self.max_depth = 0
+        self.processed = 0
+        self.failed = 0
+
+
+class ChatDispatcher:
+    """
+    Fixed set of worker queues for update processing, selected by hashing the chat id.
+
+    Slow handlers (voice transcription, TTS, charts, chained weather calls) only hold up
+    the chats sharing their queue instead of the whole bot, and the messages of a chat
+    are never processed out of order. Per-queue latency (waiting time in the queue and
+    handling time) is kept to spot hot queues and to size the pool.
+    """
+
+    def __init__(self, workers=DISPATCH_WORKERS, queue_size=DISPATCH_QUEUE_SIZE, name="dispatch"):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.name = name
+        self._queues = [_ChatQueue(i, queue_size) for i in range(workers)]
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """
+        Starts the worker threads and the metrics reporter. Calling it again has no effect.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for chat_queue in self._queues:
+            threading.Thread(target=self._work, args=(chat_queue,), name=f"{self.name}-{chat_queue.index}",
+                             daemon=True).start()
+        threading.Thread(target=self._report, name=f"{self.name}-metrics", daemon=True).start()
+
+    def queue_for(self, chat_id):
+        return self._queues[hash(chat_id) % self.workers]
+
+    def dispatch(self, chat_id, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) behind all earlier work of the same chat.
+        Blocks while the chat's queue is full.
+        """
+        if not self._started:
+            self.start()
+        chat_queue = self.queue_for(chat_id)
+        chat_queue.queue.put((time.monotonic(), fn, args, kwargs))
+        with chat_queue.lock:
+            chat_queue.max_depth = max(chat_queue.max_depth, chat_queue.queue.qsize())
+
+    def _work(self, chat_queue):
+        while True:
+            enqueued, fn, args, kwargs = chat_queue.queue.get()
+            started = time.monotonic()
+            try:
+                fn(*args, **kwargs)
+                failed = False
+            except Exception as e:
+                failed = True
+                print(f"[{self.name}-{chat_queue.index}] Update failed: {e}")
+            finally:
+                finished = time.monotonic()
+                with chat_queue.lock:
+                    chat_queue.waits.append(started - enqueued)
+                    chat_queue.durations.append(finished - started)
+                    chat_queue.max_wait = max(chat_queue.max_wait, started - enqueued)
+                    chat_queue.processed += 1
+                    chat_queue.failed += failed
+                chat_queue.queue.task_done()
+
+    def metrics(self):
+        """
+        Returns a snapshot of the metrics of every queue.
+
+        Returns:
+            list: One dict per queue with depth, counters and wait/handling time statistics (seconds).
+        """
+        snapshot = []
+        for chat_queue in self._queues:
+            with chat_queue.lock:
+                waits = sorted(chat_queue.waits)
+                durations = sorted(chat_queue.durations)
+                snapshot.append({
+                    "queue": chat_queue.index,
+                    "depth": chat_queue.queue.qsize(),
+                    "max_depth": chat_queue.max_depth,
+                    "processed": chat_queue.processed,
+                    "failed": chat_queue.failed,
+                    "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                    "wait_p95": waits[int(len(waits) * 0.95) - 1] if waits else 0.0,
+                    "wait_max": chat_queue.max_wait,
+                    "handle_avg": sum(durations) / len(durations) if durations else 0.0,
+                    "handle_p95": durations[int(len(durations) * 0.95) - 1] if durations else 0.0,
+                })
+        return snapshot
+
+    def format_metrics(self):
+        """
+        Returns the metrics as log lines, one per queue.
+        """
+        return "\n".join(
+            f"[{self.name}-{m['queue']}] depth {m['depth']}/{self.queue_size} (max {m['max_depth']}), "
+            f"processed {m['processed']}, failed {m['failed']}, "
+            f"wait avg {m['wait_avg']:.2f}s p95 {m['wait_p95']:.2f}s max {m['wait_max']:.2f}s, "
+            f"handling avg {m['handle_avg']:.2f}s p95 {m['handle_p95']:.2f}s"
+            for m in self.metrics())
+
+    def _report(self):
+        last_processed = 0
+        while True:
+            time.sleep(DISPATCH_METRICS_INTERVAL)
+            processed = sum(q.processed for q in self._queues)
+            if processed != last_processed or any(q.queue.qsize() for q in self._queues):
+                print(self.format_metrics())
+                last_processed = processed
+
+    def join(self):
+        """
+        Blocks until all queued updates are processed.
+        """
+        for chat_queue in self._queues:
+            chat_queue.queue.join()
+
+
+class OrderedTeleBot(telebot.TeleBot):
+    """
+    TeleBot that hands every update to a ChatDispatcher instead of telebot's shared worker pool.
+    The bot itself runs non-threaded, so the handlers of an update run on the worker queue of its chat.
+    """
+
+    def __init__(self, token, dispatcher=None, **kwargs):
+        kwargs["threaded"] = False
+        super().__init__(token, **kwargs)
+        self.dispatcher = dispatcher or ChatDispatcher()
+
+    def process_new_updates(self, updates):
+        # Confirm the whole batch before handing it over, so the next getUpdates does not return it again
+        # (the workers only ever see update ids at or below last_update_id and leave it alone)
+        for update in updates:
+            if update.update_id > self.last_update_id:
+                self.last_update_id = update.update_id
+        for update in updates:
+            self.dispatcher.dispatch(update_chat_id(update), super().process_new_updates, [update])
@@ -0,0 +1,300 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image, ImageDraw, ImageFont
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+# Forecast card template per language
+BACKGROUNDS = {"de": "Forecast_de.png", "en": "Forecast_en.png"}
+ICON_NAMES = ("sun", "cloud", "rain", "snow", "fog", "drizzle", "hail", "sleet", "thunder", "unknown")
+ICON_SIZE = (340, 340)
+FONT_LARGE_SIZE = 40
+FONT_SMALL_SIZE = 25
+# zlib level of the PNG: 3 encodes noticeably faster than the default 6 for a slightly larger upload
+CHART_PNG_COMPRESS_LEVEL = 3
+
+DAY_LABELS = {
+    "de": ["Heute", "Morgen", "Übermorgen"],
+    "en": ["Today", "Tomorrow", "Day After Tomorrow"],
+}
+# Marker in front of the average temperature in the get_weather text
+TEMP_MARKERS = {"de": "Ø", "en": "avg"}
+# Horizontal offsets of the text and the icons on the three cards
+TEXT_X_OFFSETS = [80, 45, 15]
+ICON_X_OFFSETS = [45, 40, 45]
+# Number of rendered charts kept in memory (about 180 KiB each)
+CHART_CACHE_SIZE = 128
+# Worker processes rendering the charts, so PIL compositing does not hold the GIL of the bot process
+# (0 renders in the calling thread)
+CHART_RENDER_WORKERS = int(os.environ.get("WNW_CHART_RENDER_WORKERS", "2"))
+# Seconds a render may take; after that it fails and the worker processes are replaced
+CHART_RENDER_TIMEOUT = float(os.environ.get("WNW_CHART_RENDER_TIMEOUT", "10"))
+
+
+class ChartAssets:
+    """
+    Backgrounds, fonts and icons of the forecast chart, loaded once.
+    The icons are already resized to the size they are pasted with.
+    """
+
+    def __init__(self, assets_dir=ASSETS_DIR):
+        fonts_dir = os.path.join(assets_dir, "fonts")
+        # The template is opaque, so it stays RGB (smaller and faster PNG than RGBA)
+        self.backgrounds = {lang: Image.open(os.path.join(assets_dir, name)).convert("RGB")
+                            for lang, name in BACKGROUNDS.items()}
+        self.font_large = ImageFont.truetype(os.path.join(fonts_dir, "Roboto-Bold.ttf"), FONT_LARGE_SIZE)
+        self.font_small = ImageFont.truetype(os.path.join(fonts_dir, "Roboto-Regular.ttf"), FONT_SMALL_SIZE)
+        self.icons = {}
+        for name in ICON_NAMES:
+            path = os.path.join(assets_dir, "icons", f"{name}.png")
+            if os.path.exists(path):
+                self.icons[name] = Image.open(path).convert("RGBA").resize(ICON_SIZE)
+
+
+# Loaded at import, like the spaCy models of the other modules. The module only depends on PIL,
+# so importing it stays cheap (no spaCy or API clients).
+assets = ChartAssets()
+
+
+def get_weather_icon_name(description):
+    """
+    Returns the name of the weather icon matching a weather description.
+    """
+    description = description.lower()
+    if "sunny" in description or "clear" in description or "sonnig" in description:
+        return "sun"
+    elif "cloudy" in description or "bewölkt" in description:
+        return "cloud"
+    elif "rain" in description or "regenfall" in description:
+        return "rain"
+    elif "snow" in description or "schneefall" in description:
+        return "snow"
+    elif "fog" in description or "nebel" in description:
+        return "fog"
+    elif "drizzle" in description or "nieselregen" in description:
+        return "drizzle"
+    elif "ice pellets" in description or "hagel" in description:
+        return "hail"
+    elif "sleet shower" in description or "graupelschauer" in description:
+        return "sleet"
+    elif "thunder" in description or "gewitter" in description:
+        return "thunder"
+    else:
+        return "unknown"
+
+
+def parse_forecast_day(data, day_label, lang):
+    """
+    Extracts the average temperature and the description of one day from a get_weather result.
+
+    Returns:
+        dict: {'day', 'temp', 'desc'}
+    """
+    no_data = "No data" if lang == "en" else "Keine Daten"
+    if not data or "text" not in data:
+        return {"day": day_label, "temp": 0, "desc": no_data}
+
+    marker = TEMP_MARKERS[lang]
+    avg_temp = 0.0
+    if marker in data["text"]:
+        try:
+            avg_temp = float(data["text"].split(marker)[1].split("°C")[0].strip())
+        except ValueError:
+            avg_temp = 0.0
+
+    match = re.search(r":\s*(.*?)\,\s*" + re.escape(marker), data["text"])
+    return {"day": day_label, "temp": avg_temp, "desc": match.group(1) if match else no_data}
+
+
+def render_forecast(location, forecast_data, lang):
+    """
+    Draws the forecast onto the card template of the language, entirely in memory.
+
+    Args:
+        location (str): Name of the location, drawn as the title.
+        forecast_data (list): The three days, dicts {'day', 'temp', 'desc'} (see parse_forecast_day).
+        lang (str): 'de' or 'en'.
+
+    Returns:
+        bytes: The PNG image.
+    """
+    image = assets.backgrounds[lang].copy()
+    draw = ImageDraw.Draw(image)
+
+    card_width = image.width // 3
+    draw.text((card_width + 70, 50), f"{location}", font=assets.font_large, fill="black")
+    for i, forecast in enumerate(forecast_data):
+        x = i * card_width + TEXT_X_OFFSETS[i]
+        y = 800
+
+        icon = assets.icons.get(get_weather_icon_name(forecast["desc"]))
+        if icon is not None:
+            image.paste(icon, (x - ICON_X_OFFSETS[i], 340), icon)
+
+        draw.text((x, y), f"{forecast['temp']}°C", font=assets.font_large, fill="black")
+        draw.text((x, y + 60), forecast["desc"], font=assets.font_small, fill="black")
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=CHART_PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+def chart_caption(location, lang):
+    return f"📊 Weather Forecast for {location}" if lang == "en" else f"📊 Wetterkarte für {location}"
+
+
+def _warm_up_worker(pids):
+    # Reports the worker to the pool (so a hanging worker can be killed), then warms up:
+    # the assets are inherited from the parent through fork, one render per language
+    # runs the whole drawing and encoding path once before the first request
+    pids.put(os.getpid())
+    for lang, labels in DAY_LABELS.items():
+        render_forecast(lang, [{"day": label, "temp": 0.0, "desc": label} for label in labels], lang)
+
+
+class ChartRenderPool:
+    """
+    Pre-warmed worker processes rendering forecast charts (render_forecast) off the bot process.
+
+    The workers are forked, so they start with the assets already loaded and without importing the bot
+    (spawned processes would run the main module, spaCy models included). start() should therefore be
+    called at startup, before the bot starts its threads.
+    """
+
+    def __init__(self, workers=CHART_RENDER_WORKERS, timeout=CHART_RENDER_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self._executor = None
+        # Process ids of the workers of the current executor
+        self._pids = set()
+
+    def start(self):
+        """
+        Forks the workers and waits until they are warmed up. Calling it again has no effect.
+        """
+        if self.workers <= 0 or "fork" not in multiprocessing.get_all_start_methods():
+            return None
+        with self.lock:
+            if self._executor is None:
+                context = multiprocessing.get_context("fork")
+                pids = context.Queue()
+                executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                               initializer=_warm_up_worker, initargs=(pids,))
+                # With fork all workers are started on the first submit
+                executor.submit(int).result()
+                self._pids = {pids.get(timeout=self.timeout) for _ in range(self.workers)}
+                pids.close()
+                self._executor = executor
+            return self._executor
+
+    def render(self, location, forecast_data, lang):
+        """
+        Renders a chart on a worker (in the calling thread if the pool is disabled).
+
+        Returns:
+            bytes: The PNG image.
+
+        Raises:
+            TimeoutError: The render took longer than the timeout.
+        """
+        executor = self.start()
+        if executor is None:
+            return render_forecast(location, forecast_data, lang)
+        try:
+            return executor.submit(render_forecast, location, forecast_data, lang).result(timeout=self.timeout)
+        except (TimeoutError, BrokenProcessPool):
+            self._replace(executor)
+            raise
+
+    def _replace(self, executor):
+        # A hanging render cannot be cancelled, so the processes are killed and the next render starts new ones
+        with self.lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            pids, self._pids = self._pids, set()
+        print("[charts] Render pool replaced after a timeout or a crashed worker")
+        # Only processes this process forked are killed, so a reused process id is never hit
+        for process in multiprocessing.active_children():
+            if process.pid in pids:
+                process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self._executor = self._executor, None
+            self._pids = set()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Shared render pool of the bot process
+render_pool = ChartRenderPool()
+
+
+def chart_key(location, lang, forecast_date, forecast_data):
+    """
+    Cache key of a chart: the location, the language, the date of the first forecast day and a hash
+    of everything drawn, so a changed forecast gets a new key instead of an outdated image.
+    """
+    drawn = json.dumps([location, lang, forecast_data], sort_keys=True, ensure_ascii=False)
+    return (location, lang, forecast_date.isoformat(), hashlib.sha1(drawn.encode("utf-8")).hexdigest())
+
+
+@dataclass(slots=True)
+class CachedChart:
+    png: bytes
+    # Telegram file_id of the uploaded image, set after the first send_photo
+    file_id: str = None
+
+
+class ChartCache:
+    """
+    LRU cache of rendered charts by chart_key. The same location and day give the same chart for every
+    user, so it is rendered once and, once uploaded, sent by its file_id without uploading it again.
+    Charts of past days are dropped when a new chart is stored.
+    """
+
+    def __init__(self, size=CHART_CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self._charts = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            chart = self._charts.get(key)
+            if chart is not None:
+                self._charts.move_to_end(key)
+            return chart
+
+    def put(self, key, png, file_id=None):
+        with self.lock:
+            for old in [k for k in self._charts if k[2] < key[2]]:
+                del self._charts[old]
+            self._charts[key] = CachedChart(png, file_id)
+            self._charts.move_to_end(key)
+            while len(self._charts) > self.size:
+                self._charts.popitem(last=False)
+
+    def forget_file_id(self, key):
+        """
+        Drops the file_id of a chart (e.g. rejected by Telegram), the next send uploads the PNG again.
+        """
+        with self.lock:
+            chart = self._charts.get(key)
+            if chart is not None:
+                chart.file_id = None
+
+
+# Shared cache of the bot process
+chart_cache = ChartCache()
@@ -232,8 +232,8 @@ class IntentDetector:
         intent_priority = [
             "routine_list",   # Check specific routines before general routine
             "routine_delete", 
+            "reminder",       # Before routine, so "erinnere mich jeden Tag ..." stays a (recurring) reminder
             "routine", 
-            "reminder",
             "weather",
             "preference",     # Check preferences before packing/wardrobe
             "packing",        # Main functionality
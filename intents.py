@@ -0,0 +1,199 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# What a handler can ask for besides the message and its text. Every need is computed at most once
+# per message and only if a handler declares it, so e.g. the spaCy parse is shared and skipped where unused.
+NEEDS = ("language", "doc", "location", "time")
+# Upper bounds in seconds of the latency histogram buckets, slower calls land in a last open bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Interval in seconds for logging the intent metrics (only while there is traffic)
+INTENT_METRICS_INTERVAL = 300
+
+
+class IntentRequest:
+    """
+    A message to answer, with its text and language. The other needs are computed on first access
+    by the providers of the registry and cached for the rest of the request.
+    """
+
+    def __init__(self, registry, message, text, language):
+        self.registry = registry
+        self.message = message
+        self.text = text
+        self.language = language
+        self._values = {"language": language}
+
+    def need(self, name):
+        if name not in self._values:
+            self._values[name] = self.registry.providers[name](self)
+        return self._values[name]
+
+
+class _IntentStats:
+    def __init__(self):
+        self.calls = 0
+        self.failed = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, duration, failed):
+        self.calls += 1
+        self.failed += failed
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the quantile (None for the open bucket)
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (None,), self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class IntentRegistry:
+    """
+    Maps every intent to its handler and the needs the handler declares.
+
+    Handlers are called as handler(message, text, **needs) and return the reply text (or None if they
+    answered themselves). Every call is timed, so the per-intent call counts and latency histograms
+    show which feature dominates the response time. Messages without a handler are counted as "unknown".
+    """
+
+    def __init__(self, name="intents"):
+        self.name = name
+        self.handlers = {}
+        self.providers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._reporting = False
+
+    def provider(self, need):
+        """
+        Decorator registering how a need is computed: provider(request) -> value.
+        """
+        if need not in NEEDS:
+            raise ValueError(f"Unknown need: {need}")
+
+        def decorator(fn):
+            self.providers[need] = fn
+            return fn
+        return decorator
+
+    def intent(self, name, needs=("language",)):
+        """
+        Decorator registering the handler of an intent with the needs it is called with.
+        """
+        unknown = [need for need in needs if need not in NEEDS]
+        if unknown:
+            raise ValueError(f"Unknown needs of intent {name}: {unknown}")
+
+        def decorator(fn):
+            self.handlers[name] = (fn, tuple(needs))
+            return fn
+        return decorator
+
+    def __contains__(self, name):
+        return name in self.handlers
+
+    def needs(self, name, request):
+        """
+        Returns the declared needs of an intent for a request, as keyword arguments of its handler.
+        """
+        return {need: request.need(need) for need in self.handlers[name][1]}
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Records the duration of the enclosed block as one call of the intent (failed if it raises).
+        """
+        if not self._reporting:
+            self.start_reporting()
+        started = time.monotonic()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            duration = time.monotonic() - started
+            with self._lock:
+                self._stats.setdefault(name, _IntentStats()).record(duration, failed)
+
+    def handle(self, name, message, text, language):
+        """
+        Runs the handler of an intent with its needs.
+
+        Returns:
+            tuple: (True, reply of the handler), or (False, None) if the intent has no handler.
+        """
+        if name not in self.handlers:
+            with self.measure("unknown"):
+                pass
+            return False, None
+        handler = self.handlers[name][0]
+        request = IntentRequest(self, message, text, language)
+        with self.measure(name):
+            return True, handler(message, text, **self.needs(name, request))
+
+    def metrics(self):
+        """
+        Returns a snapshot of the metrics of every intent.
+
+        Returns:
+            dict: intent -> dict with counters, average/maximum latency (seconds),
+                  p50/p95 bucket bounds and the histogram as (bucket bound, count) pairs.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "calls": stats.calls,
+                    "failed": stats.failed,
+                    "avg": stats.total / stats.calls if stats.calls else 0.0,
+                    "max": stats.max,
+                    "total": stats.total,
+                    "p50": stats.quantile(0.5),
+                    "p95": stats.quantile(0.95),
+                    "histogram": list(zip(LATENCY_BUCKETS + (None,), stats.buckets)),
+                }
+                for name, stats in self._stats.items()
+            }
+
+    def format_metrics(self):
+        """
+        Returns the metrics as log lines, one per intent, the intent with the most total time first.
+        """
+        def bound(value):
+            return f"<={value}s" if value is not None else f">{LATENCY_BUCKETS[-1]}s"
+
+        metrics = sorted(self.metrics().items(), key=lambda item: item[1]["total"], reverse=True)
+        return "\n".join(
+            f"[{self.name}] {name}: {m['calls']} calls, {m['failed']} failed, total {m['total']:.1f}s, "
+            f"avg {m['avg']:.2f}s max {m['max']:.2f}s, p50 {bound(m['p50'])} p95 {bound(m['p95'])} | "
+            + " ".join(f"{bound(b)}:{count}" for b, count in m["histogram"] if count)
+            for name, m in metrics)
+
+    def start_reporting(self):
+        """
+        Starts the thread logging the metrics every INTENT_METRICS_INTERVAL seconds. Calling it again has no effect.
+        """
+        with self._lock:
+            if self._reporting:
+                return
+            self._reporting = True
+        threading.Thread(target=self._report, name=f"{self.name}-metrics", daemon=True).start()
+
+    def _report(self):
+        last_calls = 0
+        while True:
+            time.sleep(INTENT_METRICS_INTERVAL)
+            with self._lock:
+                calls = sum(stats.calls for stats in self._stats.values())
+            if calls != last_calls:
+                print(self.format_metrics())
+                last_calls = calls
@@ -0,0 +1,361 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+
+# Telegram's send limits: about 30 messages per second overall, one per second per chat
+# (short bursts are tolerated) and 20 per minute per group
+OUTBOUND_GLOBAL_RATE = 30
+OUTBOUND_GLOBAL_BURST = 30
+OUTBOUND_CHAT_RATE = 1
+OUTBOUND_CHAT_BURST = 3
+OUTBOUND_GROUP_RATE = 20 / 60
+# Threads performing the HTTP calls (the rate limits, not the threads, bound the throughput)
+OUTBOUND_WORKERS = 8
+# Attempts per send for 429 (flood control), failed connects and 5xx answers before the send fails
+OUTBOUND_MAX_ATTEMPTS = 5
+# Backoff in seconds after a failed connect or a 5xx answer, doubled with every further attempt
+OUTBOUND_RETRY_BACKOFF = 1
+# Interval in seconds for logging the outbound metrics (only while there is traffic)
+OUTBOUND_METRICS_INTERVAL = 60
+
+# Lanes: interactive replies are always sent before scheduled pushes (routines, reminders)
+INTERACTIVE = 0
+SCHEDULED = 1
+LANE_NAMES = ("interactive", "scheduled")
+
+_lane = threading.local()
+
+
+def current_lane():
+    return getattr(_lane, "value", INTERACTIVE)
+
+
+@contextmanager
+def scheduled():
+    """
+    Sends made by the current thread inside the block go through the scheduled lane.
+    """
+    previous = current_lane()
+    _lane.value = SCHEDULED
+    try:
+        yield
+    finally:
+        _lane.value = previous
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, at most `capacity` saved up for bursts.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        # No tokens accumulate during a pause
+        elapsed = max(0.0, now - max(self.updated, self.paused_until))
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """
+        Seconds until a token is available (0 if one is available now).
+        """
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, until):
+        """
+        Hands out no tokens before `until` (Telegram's retry_after), then a single one for the retry.
+        """
+        self.paused_until = max(self.paused_until, until)
+        self.tokens = 1
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+
+class _Send:
+    __slots__ = ("chat_id", "fn", "args", "kwargs", "lane", "seq", "future", "attempts", "enqueued", "files")
+
+    def __init__(self, chat_id, fn, args, kwargs, lane, seq):
+        self.chat_id = chat_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.lane = lane
+        self.seq = seq
+        self.future = Future()
+        self.attempts = 0
+        self.enqueued = time.monotonic()
+        # Uploaded files are read by every attempt, so remember where they start
+        self.files = [(f, f.tell()) for f in itertools.chain(args, kwargs.values())
+                      if hasattr(f, "read") and hasattr(f, "seek") and hasattr(f, "tell")]
+
+    def rewind(self):
+        for f, position in self.files:
+            f.seek(position)
+
+
+def _is_connect_error(error):
+    """
+    True if the request cannot have reached Telegram, so another attempt sends nothing twice.
+    Read timeouts and connections dropped while waiting for the answer are not retried:
+    the message may already be delivered.
+    """
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # Failed connects of the sync bot arrive as MaxRetryError (or ConnectTimeout) whose reason
+        # is a urllib3 connect error (NewConnectionError subclasses ConnectTimeoutError)
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(error, requests.exceptions.ConnectTimeout) or isinstance(reason, ConnectTimeoutError)
+    # The async bot raises ConnectionError only for failed connects (see async_bot._run_on_loop)
+    return isinstance(error, ConnectionError)
+
+
+def _retry_after(error):
+    # 429 of the sync (apihelper) and the async (asyncio_helper) bot carry the same result_json
+    if getattr(error, "error_code", None) != 429:
+        return None
+    parameters = (getattr(error, "result_json", None) or {}).get("parameters") or {}
+    return parameters.get("retry_after", OUTBOUND_RETRY_BACKOFF)
+
+
+class OutboundQueue:
+    """
+    Outgoing Telegram calls, sent within the global and the per-chat rate limits.
+
+    Sends wait in two lanes; the scheduler thread always picks the oldest send of the interactive lane
+    whose chat has a token, then the scheduled lane. The sends of a chat keep their order within a lane,
+    only one send per chat is in flight at a time. A 429 answer pauses the chat for retry_after seconds
+    and the send is tried again. Failed connects and 5xx answers are retried with backoff, read timeouts
+    are not (the message may already be delivered, another attempt would send it twice).
+    """
+
+    def __init__(self, workers=OUTBOUND_WORKERS, name="outbound"):
+        self.name = name
+        self._global = TokenBucket(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_BURST)
+        self._chats = {}
+        self._ready = []
+        self._delayed = []
+        self._parked = {}
+        self._in_flight = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._started = False
+        self.sent = [0, 0]
+        self.retried = 0
+        self.failed = 0
+        self._waits = [0.0, 0.0]
+        self._max_wait = [0.0, 0.0]
+
+    def start(self):
+        """
+        Starts the scheduler thread and the metrics reporter. Calling it again has no effect.
+        """
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._schedule, name=f"{self.name}-scheduler", daemon=True).start()
+        threading.Thread(target=self._report, name=f"{self.name}-metrics", daemon=True).start()
+
+    def submit(self, chat_id, fn, *args, lane=None, **kwargs):
+        """
+        Queues the Telegram call fn(*args, **kwargs) addressed to chat_id.
+
+        Args:
+            lane (int): INTERACTIVE or SCHEDULED, defaults to the lane of the current thread (see scheduled()).
+
+        Returns:
+            Future: Result of the call, or its exception once all attempts failed.
+        """
+        if not self._started:
+            self.start()
+        lane = current_lane() if lane is None else lane
+        if isinstance(chat_id, str) and chat_id.lstrip("-").isdigit():
+            # Some handlers address chats by their id as string, they share the limits of the chat
+            chat_id = int(chat_id)
+        send = _Send(chat_id, fn, args, kwargs, lane, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._ready, (send.lane, send.seq, send))
+            self._cond.notify()
+        return send.future
+
+    def call(self, chat_id, fn, *args, **kwargs):
+        """
+        Like submit(), but waits for the call and returns its result (or raises its exception).
+        """
+        return self.submit(chat_id, fn, *args, **kwargs).result()
+
+    def _bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Group and channel ids are negative
+            rate = OUTBOUND_GROUP_RATE if isinstance(chat_id, int) and chat_id < 0 else OUTBOUND_CHAT_RATE
+            bucket = self._chats[chat_id] = TokenBucket(rate, OUTBOUND_CHAT_BURST)
+        return bucket
+
+    def _schedule(self):
+        last_prune = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, lane, seq, send = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (lane, seq, send))
+                if now - last_prune > OUTBOUND_METRICS_INTERVAL:
+                    self._prune(now)
+                    last_prune = now
+                if not self._ready:
+                    self._cond.wait(self._delayed[0][0] - now if self._delayed else None)
+                    continue
+                global_wait = self._global.wait_time(now)
+                if global_wait > 0:
+                    self._cond.wait(global_wait)
+                    continue
+
+                _, _, send = heapq.heappop(self._ready)
+                if send.chat_id in self._in_flight:
+                    # Keeps the order of the chat: released when the running send finishes
+                    self._parked.setdefault(send.chat_id, []).append(send)
+                    continue
+                bucket = self._bucket(send.chat_id)
+                chat_wait = bucket.wait_time(now)
+                if chat_wait > 0:
+                    heapq.heappush(self._delayed, (now + chat_wait, send.lane, send.seq, send))
+                    continue
+                bucket.take(now)
+                self._global.take(now)
+                self._in_flight.add(send.chat_id)
+                wait = now - send.enqueued
+                self._waits[send.lane] += wait
+                self._max_wait[send.lane] = max(self._max_wait[send.lane], wait)
+                self._executor.submit(self._send, send)
+
+    def _prune(self, now):
+        # Buckets of chats that are idle again carry no state worth keeping
+        for chat_id in [c for c, bucket in self._chats.items() if bucket.is_idle(now) and c not in self._in_flight]:
+            del self._chats[chat_id]
+
+    def _send(self, send):
+        send.attempts += 1
+        retry_at = None
+        try:
+            send.rewind()
+            result = send.fn(*send.args, **send.kwargs)
+        except Exception as e:
+            retry_after = _retry_after(e)
+            if send.attempts < OUTBOUND_MAX_ATTEMPTS and retry_after is not None:
+                retry_at = time.monotonic() + retry_after
+                print(f"[{self.name}] Flood control for chat {send.chat_id}, retrying in {retry_after}s")
+            elif send.attempts < OUTBOUND_MAX_ATTEMPTS and (_is_connect_error(e) or (getattr(e, "error_code", None) or 0) >= 500):
+                retry_at = time.monotonic() + OUTBOUND_RETRY_BACKOFF * 2 ** (send.attempts - 1)
+            else:
+                with self._cond:
+                    self.failed += 1
+                send.future.set_exception(e)
+        else:
+            with self._cond:
+                self.sent[send.lane] += 1
+            send.future.set_result(result)
+        with self._cond:
+            self._in_flight.discard(send.chat_id)
+            if retry_at is not None:
+                self.retried += 1
+                # The chat sends nothing before the retry, so its later sends stay behind it
+                self._bucket(send.chat_id).pause(retry_at)
+                heapq.heappush(self._delayed, (retry_at, send.lane, send.seq, send))
+            for parked in self._parked.pop(send.chat_id, []):
+                heapq.heappush(self._ready, (parked.lane, parked.seq, parked))
+            self._cond.notify()
+
+    def metrics(self):
+        """
+        Returns a snapshot of the outbound metrics.
+
+        Returns:
+            dict: queued sends, counters and the waiting time per lane (seconds).
+        """
+        with self._cond:
+            return {
+                "queued": len(self._ready) + len(self._delayed) + sum(len(p) for p in self._parked.values()),
+                "in_flight": len(self._in_flight),
+                "chats": len(self._chats),
+                "retried": self.retried,
+                "failed": self.failed,
+                "lanes": {
+                    LANE_NAMES[lane]: {
+                        "sent": self.sent[lane],
+                        "wait_avg": self._waits[lane] / self.sent[lane] if self.sent[lane] else 0.0,
+                        "wait_max": self._max_wait[lane],
+                    }
+                    for lane in (INTERACTIVE, SCHEDULED)
+                },
+            }
+
+    def format_metrics(self):
+        """
+        Returns the metrics as a single log line.
+        """
+        m = self.metrics()
+        lanes = ", ".join(f"{name} sent {lane['sent']} wait avg {lane['wait_avg']:.2f}s max {lane['wait_max']:.2f}s"
+                          for name, lane in m["lanes"].items())
+        return (f"[{self.name}] queued {m['queued']}, in flight {m['in_flight']}, chats {m['chats']}, "
+                f"retried {m['retried']}, failed {m['failed']}, {lanes}")
+
+    def _report(self):
+        last_sent = 0
+        while True:
+            time.sleep(OUTBOUND_METRICS_INTERVAL)
+            sent = sum(self.sent) + self.failed
+            if sent != last_sent or self.metrics()["queued"]:
+                print(self.format_metrics())
+                last_sent = sent
+
+
+class OutboundMixin:
+    """
+    Bot mixin sending every message, photo, voice, audio, document and text edit through an OutboundQueue.
+    The methods keep their telebot signatures and still return the sent message (or raise),
+    they just wait until the rate limits let the call through.
+    """
+
+    def __init__(self, *args, outbound=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outbound = outbound or OutboundQueue()
+
+    def send_message(self, chat_id, text, *args, **kwargs):
+        return self.outbound.call(chat_id, super().send_message, chat_id, text, *args, **kwargs)
+
+    def send_photo(self, chat_id, photo, *args, **kwargs):
+        return self.outbound.call(chat_id, super().send_photo, chat_id, photo, *args, **kwargs)
+
+    def send_voice(self, chat_id, voice, *args, **kwargs):
+        return self.outbound.call(chat_id, super().send_voice, chat_id, voice, *args, **kwargs)
+
+    def send_audio(self, chat_id, audio, *args, **kwargs):
+        return self.outbound.call(chat_id, super().send_audio, chat_id, audio, *args, **kwargs)
+
+    def send_document(self, chat_id, document, *args, **kwargs):
+        return self.outbound.call(chat_id, super().send_document, chat_id, document, *args, **kwargs)
+
+    def edit_message_text(self, text, chat_id=None, *args, **kwargs):
+        return self.outbound.call(chat_id, super().edit_message_text, text, chat_id, *args, **kwargs)
@@ -0,0 +1,203 @@
+import numpy as np
+
+from clothing import ANY_BIT, WEATHER_BITS
+
+
+class WardrobeArrays:
+    """
+    A wardrobe (or the wardrobes of many users) stored as parallel NumPy arrays.
+
+    Items are grouped into contiguous segments, one per (user, category), so the best item of every
+    segment can be found with a single reduceat over the whole array.
+    """
+    __slots__ = ("names", "min_temp", "max_temp", "prio", "weather", "segment",
+                 "segment_starts", "segment_categories", "segment_owners", "categories")
+
+    def __init__(self, names, min_temp, max_temp, prio, weather, segment_starts, segment_categories,
+                 segment_owners, categories):
+        self.names = names
+        self.min_temp = min_temp
+        self.max_temp = max_temp
+        self.prio = prio
+        self.weather = weather
+        self.segment_starts = segment_starts
+        self.segment_categories = segment_categories
+        self.segment_owners = segment_owners
+        self.categories = categories
+        counts = np.diff(np.append(segment_starts, len(names)))
+        self.segment = np.repeat(np.arange(len(segment_starts)), counts)
+
+    @classmethod
+    def from_wardrobes(cls, wardrobes):
+        """
+        Builds the arrays for a list of wardrobes (dict of category -> ClothingItem list).
+        Categories without items get no segment.
+
+        Args:
+            wardrobes (list): The wardrobes, their index is the owner of each segment.
+
+        Returns:
+            WardrobeArrays
+        """
+        names, min_temp, max_temp, prio, weather = [], [], [], [], []
+        segment_starts, segment_categories, segment_owners = [], [], []
+        categories = []
+        for owner, user_wardrobe in enumerate(wardrobes):
+            categories.append(list(user_wardrobe.keys()))
+            for cat, items in user_wardrobe.items():
+                if not items:
+                    continue
+                segment_starts.append(len(names))
+                segment_categories.append(cat)
+                segment_owners.append(owner)
+                for i in items:
+                    names.append(i.name)
+                    min_temp.append(i.min_temp)
+                    max_temp.append(i.max_temp)
+                    prio.append(i.prio)
+                    weather.append(i.weather)
+        return cls(
+            names,
+            np.array(min_temp, dtype=np.int16),
+            np.array(max_temp, dtype=np.int16),
+            np.array(prio, dtype=np.int32),
+            np.array(weather, dtype=np.uint8),
+            np.array(segment_starts, dtype=np.int64),
+            segment_categories,
+            np.array(segment_owners, dtype=np.int64),
+            categories,
+        )
+
+    @classmethod
+    def from_wardrobe(cls, user_wardrobe):
+        return cls.from_wardrobes([user_wardrobe])
+
+    def __len__(self):
+        return len(self.names)
+
+
+def match_day(arrays, temp, weather_type):
+    """
+    Items fitting a single temperature and weather type (same rule as ClothingItem.fits).
+
+    Returns:
+        np.ndarray: Boolean mask over all items.
+    """
+    wanted = ANY_BIT | WEATHER_BITS.get(weather_type, 0)
+    return (arrays.min_temp <= temp) & (temp <= arrays.max_temp) & ((arrays.weather & wanted) != 0)
+
+
+def match_days(arrays, temps, weather_types):
+    """
+    Items fitting each of several conditions (e.g. the days of a trip).
+
+    Args:
+        temps: Temperatures, one per condition.
+        weather_types: Weather types, one per condition.
+
+    Returns:
+        np.ndarray: Boolean matrix (conditions x items).
+    """
+    temps = np.asarray(temps, dtype=np.int16)[:, None]
+    wanted = np.array([ANY_BIT | WEATHER_BITS.get(w, 0) for w in weather_types], dtype=np.uint8)[:, None]
+    return (arrays.min_temp[None, :] <= temps) & (temps <= arrays.max_temp[None, :]) & ((arrays.weather[None, :] & wanted) != 0)
+
+
+def best_in_segments(arrays, mask):
+    """
+    Marks the matching items with the best (lowest) priority of every segment.
+
+    Returns:
+        np.ndarray: Boolean mask over all items.
+    """
+    if not len(arrays):
+        return np.zeros(0, dtype=bool)
+    sentinel = np.iinfo(np.int32).max
+    masked_prio = np.where(mask, arrays.prio, sentinel)
+    best_prio = np.minimum.reduceat(masked_prio, arrays.segment_starts)
+    return mask & (masked_prio == best_prio[arrays.segment])
+
+
+def _group_by_segment(arrays, selected):
+    result = {}
+    for index in np.flatnonzero(selected):
+        result.setdefault(int(arrays.segment[index]), []).append(arrays.names[index])
+    return result
+
+
+def suggest_many(arrays, temp, weather_type):
+    """
+    Best outfit candidates for every owner in one vectorized pass.
+
+    Returns:
+        list: One dict per owner, category -> tuple of item names with the best priority
+              (empty tuple if nothing fits).
+    """
+    by_segment = _group_by_segment(arrays, best_in_segments(arrays, match_day(arrays, temp, weather_type)))
+    suggestions = [{cat: () for cat in cats} for cats in arrays.categories]
+    for segment, names in by_segment.items():
+        owner = arrays.segment_owners[segment]
+        suggestions[owner][arrays.segment_categories[segment]] = tuple(names)
+    return suggestions
+
+
+def suggest(arrays, temp, weather_type):
+    """
+    Best outfit candidates of a single wardrobe, category -> tuple of item names.
+    """
+    return suggest_many(arrays, temp, weather_type)[0]
+
+
+def cover(arrays, temps, weather_types, prio_weight=0.1):
+    """
+    Greedy weighted set cover per category: the fewest items that together fit every condition
+    (e.g. the cold morning and the hot afternoon of every day of a trip).
+
+    All categories are solved at once: every round computes the number of still uncovered conditions
+    each item would cover (one matrix operation) and picks, per category, the item with the best
+    coverage per cost. The cost of an item is 1 plus prio_weight times its priority rank within the category,
+    so fewer items always come first and the preferred item wins among equally good ones.
+
+    Args:
+        temps: Temperatures, one per condition.
+        weather_types: Weather types, one per condition.
+        prio_weight (float): Weight of the priority in the item cost.
+
+    Returns:
+        tuple: (dict category -> list of item names in pick order,
+                dict category -> list of condition indices no item of the category fits)
+    """
+    categories = arrays.categories[0] if arrays.categories else []
+    packing = {cat: [] for cat in categories}
+    if not len(temps):
+        return packing, {}
+    if not len(arrays):
+        return packing, {cat: list(range(len(temps))) for cat in categories}
+
+    fits = match_days(arrays, temps, weather_types)
+    starts = arrays.segment_starts
+    segment = arrays.segment
+    coverable = np.logical_or.reduceat(fits, starts, axis=1)
+
+    seg_min = np.minimum.reduceat(arrays.prio, starts)
+    seg_max = np.maximum.reduceat(arrays.prio, starts)
+    cost = 1 + prio_weight * (arrays.prio - seg_min[segment]) / (seg_max - seg_min + 1)[segment]
+
+    uncovered = coverable.copy()
+    while uncovered.any():
+        gain = (fits & uncovered[:, segment]).sum(axis=0)
+        score = gain / cost
+        best = np.maximum.reduceat(score, starts)
+        candidates = np.flatnonzero((gain > 0) & (score == best[segment]))
+        # First best item of every segment that still has uncovered conditions
+        _, first = np.unique(segment[candidates], return_index=True)
+        picks = candidates[first]
+        for index in picks:
+            packing[arrays.segment_categories[segment[index]]].append(arrays.names[index])
+        uncovered[:, segment[picks]] &= ~fits[:, picks]
+
+    # Conditions no item fits, categories without items fit none
+    missing = {cat: list(range(len(temps))) for cat in categories}
+    for seg_index, cat in enumerate(arrays.segment_categories):
+        missing[cat] = np.flatnonzero(~coverable[:, seg_index]).tolist()
+    return packing, {cat: conditions for cat, conditions in missing.items() if conditions}
@@ -5,13 +5,24 @@ nlp_de = spacy.load("de_core_news_sm") # python -m spacy download de_core_news_s
 nlp_en = spacy.load("en_core_web_sm") # python -m spacy download en_core_web_sm to install the English model
 
 import random
+from array import array
 
 # To safe the reminder information, we use a JSON file
 import json
 import os
 import datetime
+import atexit
+import threading
+import time
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import wardrobe
 import weather
+import outfit_engine
+from clothing import ANY_BIT, WEATHER_BITS, normalize_name
+from storage import atomic_write_json
+from reminder import WEEKDAY_NAMES
 
 # Helper to extract temp and weather_type from weather.get_weather
 
@@ -20,12 +31,20 @@ def get_weather_forecast_compat(location, dt, language):
     Compatibility wrapper for weather.get_weather to extract temp and weather_type.
     Returns dict with 'temp' and 'weather_type' or None if not available.
     """
-    import re
     # Determine forecast_day (0=today, 1=tomorrow, 2=overmorrow)
     today = datetime.datetime.now().date()
     day_diff = (dt.date() - today).days
     forecast_day = day_diff if 0 <= day_diff <= 2 else None
     result = weather.get_weather(location, language, forecast_day)
+    return parse_weather_result(result)
+
+def parse_weather_result(result):
+    """
+    Extracts temp and weather_type from an already fetched weather.get_weather result,
+    so a forecast shared by many users (e.g. a routine slot) is only fetched once.
+    Returns dict with 'temp' and 'weather_type' or None if not available.
+    """
+    import re
     if not result or 'text' not in result:
         return None
     text = result['text']
@@ -41,7 +60,125 @@ def get_weather_forecast_compat(location, dt, language):
         weather_type = text.split(',')[0].strip()
     return {'temp': temp, 'weather_type': weather_type}
 
-def get_outfit_suggestion(chat_id, location, dt, language="de"):
+# Range of the precomputed outfit tables, temperatures outside are matched directly
+TABLE_MIN_TEMP = -30
+TABLE_MAX_TEMP = 50
+WEATHER_TYPES = ("sunny", "rain", "snow", "cloudy", "any")
+
+def best_candidates(items, temp, weather_type):
+    """
+    Returns the names of all matching items (ClothingItem) with the best (lowest) priority.
+    """
+    filtered = [i for i in items if i.fits(temp, weather_type)]
+    if not filtered:
+        return ()
+    best_prio = min(i.prio for i in filtered)
+    return tuple(i.name for i in filtered if i.prio == best_prio)
+
+class OutfitTable:
+    """
+    Precomputed outfit candidates of one user for every integer temperature in
+    [TABLE_MIN_TEMP, TABLE_MAX_TEMP] and every weather type.
+    Each category has one compact array with an index into the shared list of distinct candidate sets,
+    so a suggestion is a single lookup per category.
+    """
+    __slots__ = ("version", "categories", "candidate_sets", "cells")
+
+    def __init__(self, user_wardrobe, version):
+        self.version = version
+        self.categories = list(user_wardrobe.keys())
+        self.candidate_sets = []
+        set_index = {}
+        self.cells = []
+        for cat in self.categories:
+            items = user_wardrobe[cat]
+            cells = array('H')
+            for temp in range(TABLE_MIN_TEMP, TABLE_MAX_TEMP + 1):
+                for weather_type in WEATHER_TYPES:
+                    candidates = best_candidates(items, temp, weather_type)
+                    if candidates not in set_index:
+                        set_index[candidates] = len(self.candidate_sets)
+                        self.candidate_sets.append(candidates)
+                    cells.append(set_index[candidates])
+            self.cells.append(cells)
+
+    def covers(self, temp):
+        return TABLE_MIN_TEMP <= temp <= TABLE_MAX_TEMP
+
+    def lookup(self, category_index, temp, weather_type):
+        """
+        Returns the best candidates (item names) of a category for a temperature inside the table range.
+        """
+        weather_index = WEATHER_TYPES.index(weather_type) if weather_type in WEATHER_TYPES else WEATHER_TYPES.index('any')
+        cell = (temp - TABLE_MIN_TEMP) * len(WEATHER_TYPES) + weather_index
+        return self.candidate_sets[self.cells[category_index][cell]]
+
+# Number of users whose outfit table and wardrobe arrays are kept, the least recently used are evicted
+WARDROBE_DERIVED_CACHE_SIZE = 1000
+
+class WardrobeDerivedCache:
+    """
+    LRU cache of data derived from a user's wardrobe, by chat_id.
+    Entries are dropped when the wardrobe changes (wardrobe.on_wardrobe_change); the stored wardrobe
+    version also rejects an entry built from a wardrobe that changed while it was being built.
+    """
+
+    def __init__(self, size=WARDROBE_DERIVED_CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, chat_id, version):
+        chat_id = str(chat_id)
+        with self.lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(chat_id)
+            return entry[1]
+
+    def put(self, chat_id, version, value):
+        with self.lock:
+            self._entries[str(chat_id)] = (version, value)
+            self._entries.move_to_end(str(chat_id))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def drop(self, chat_id):
+        with self.lock:
+            self._entries.pop(str(chat_id), None)
+
+# Outfit tables and wardrobe arrays of the most recently used chats
+_outfit_tables = WardrobeDerivedCache()
+_wardrobe_arrays = WardrobeDerivedCache()
+wardrobe.on_wardrobe_change(_outfit_tables.drop)
+wardrobe.on_wardrobe_change(_wardrobe_arrays.drop)
+
+def get_outfit_table(chat_id, language="de"):
+    """
+    Returns the outfit table of a user, building it on first use and after wardrobe changes.
+    """
+    _, user_wardrobe = wardrobe.get_or_create_user_wardrobe(chat_id, language)
+    version = wardrobe.get_wardrobe_version(chat_id)
+    table = _outfit_tables.get(chat_id, version)
+    if table is None:
+        table = OutfitTable(user_wardrobe, version)
+        _outfit_tables.put(chat_id, version, table)
+    return table, user_wardrobe
+
+def get_wardrobe_arrays(chat_id, language="de"):
+    """
+    Returns the user's wardrobe as outfit_engine arrays, rebuilt after wardrobe changes.
+    """
+    _, user_wardrobe = wardrobe.get_or_create_user_wardrobe(chat_id, language)
+    version = wardrobe.get_wardrobe_version(chat_id)
+    arrays = _wardrobe_arrays.get(chat_id, version)
+    if arrays is None:
+        arrays = outfit_engine.WardrobeArrays.from_wardrobe(user_wardrobe)
+        _wardrobe_arrays.put(chat_id, version, arrays)
+    return arrays
+
+def get_outfit_suggestion(chat_id, location, dt, language="de", forecast=None):
     """
     Suggests an outfit for a given user, location, and datetime.
     Args:
@@ -49,89 +186,336 @@ def get_outfit_suggestion(chat_id, location, dt, language="de"):
         location: string (city or place)
         dt: datetime.datetime (when the outfit is needed)
         language: 'de' or 'en'
+        forecast: optional, already parsed forecast (see parse_weather_result) to skip the weather lookup
     Returns:
         str: Outfit suggestion
     """
     # Get weather for location and time
-    forecast = get_weather_forecast_compat(location, dt, language)
+    if forecast is None:
+        forecast = get_weather_forecast_compat(location, dt, language)
     if not forecast or 'temp' not in forecast:
         return "Wetterdaten konnten nicht abgerufen werden." if language.startswith("de") else "Could not retrieve weather data."
     temp = forecast['temp']
     weather_type = map_weather_type(forecast.get('weather_type', 'any'), language)
+    table, user_wardrobe = get_outfit_table(chat_id, language)
+    candidates = {}
+    for cat_index, cat in enumerate(table.categories):
+        # All items with the best (lowest) prio, precomputed per temperature and weather type
+        if table.covers(temp):
+            candidates[cat] = table.lookup(cat_index, temp, weather_type)
+        else:
+            candidates[cat] = best_candidates(user_wardrobe.get(cat, []), temp, weather_type)
+    text, suggestion_dict = format_outfit_suggestion(candidates, location, dt, temp, weather_type, language)
+    save_last_suggestion_with_context(chat_id, suggestion_dict, temp, weather_type)
+    return text
+
+def get_outfit_suggestions_bulk(chat_ids, location, dt, language="de", forecast=None):
+    """
+    Suggests outfits for many users sharing one location, time and forecast (e.g. the members of a routine slot).
+    The forecast is fetched once, all wardrobes are read in one store access and matched in one vectorized pass,
+    and the suggestion contexts are saved with a single write.
+    Args:
+        chat_ids: Telegram user ids
+        location: string (city or place)
+        dt: datetime.datetime (when the outfit is needed)
+        language: 'de' or 'en'
+        forecast: optional, already parsed forecast (see parse_weather_result) to skip the weather lookup
+    Returns:
+        dict: chat_id -> outfit suggestion (str)
+    """
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return {}
+    if forecast is None:
+        forecast = get_weather_forecast_compat(location, dt, language)
+    if not forecast or 'temp' not in forecast:
+        error = "Wetterdaten konnten nicht abgerufen werden." if language.startswith("de") else "Could not retrieve weather data."
+        return {chat_id: error for chat_id in chat_ids}
+    temp = forecast['temp']
+    weather_type = map_weather_type(forecast.get('weather_type', 'any'), language)
+    wardrobes = wardrobe.get_or_create_user_wardrobes(chat_ids, language)
+    candidates_per_user = outfit_engine.suggest_many(outfit_engine.WardrobeArrays.from_wardrobes(wardrobes), temp, weather_type)
+    suggestions = {}
+    contexts = {}
+    for chat_id, candidates in zip(chat_ids, candidates_per_user):
+        text, suggestion_dict = format_outfit_suggestion(candidates, location, dt, temp, weather_type, language)
+        suggestions[chat_id] = text
+        contexts[chat_id] = (suggestion_dict, temp, weather_type)
+    save_last_suggestions_with_context(contexts)
+    return suggestions
+
+def format_outfit_suggestion(candidates, location, dt, temp, weather_type, language="de"):
+    """
+    Picks one item per category from the best candidates and builds the suggestion message.
+    Args:
+        candidates: dict category -> tuple of item names with the best priority
+    Returns:
+        tuple: (message, dict category -> chosen item)
+    """
     weather_type_disp = translate_weather_type(weather_type, language)
-    _, user_wardrobe = wardrobe.get_or_create_user_wardrobe(chat_id, language)
     suggestion = []
     suggestion_dict = {}
-    for cat, items in user_wardrobe.items():
-        filtered = [i for i in items if isinstance(i, dict) and i['min_temp'] <= temp <= i['max_temp'] and (
-            (isinstance(i.get('weather', 'any'), list) and ('any' in i.get('weather', ['any']) or weather_type in i.get('weather', []))) or
-            (isinstance(i.get('weather', 'any'), str) and (i.get('weather', 'any') == 'any' or i.get('weather', 'any') == weather_type))
-        )]
-        if filtered:
-            # Sort by priority (lower is better)
-            filtered.sort(key=lambda x: x['prio'])
-            # Find all items with the best (lowest) prio
-            best_prio = filtered[0]['prio']
-            best_items = [item for item in filtered if item['prio'] == best_prio]
+    for cat, best_items in candidates.items():
+        if best_items:
             chosen = random.choice(best_items)
-            suggestion.append(f"{cat}: {chosen['name']}")
-            suggestion_dict[cat] = chosen['name']
+            suggestion.append(f"{cat}: {chosen}")
+            suggestion_dict[cat] = chosen
         else:
             if language.startswith("de"):
                 suggestion.append(f"{cat}: Keine passende {cat.lower()} gefunden.")
             else:
                 suggestion.append(f"{cat}: No suitable {cat.lower()} found.")
-    save_last_suggestion_with_context(chat_id, suggestion_dict, temp, weather_type)
     if language.startswith("de"):
-        return f"Für {location} am {dt.strftime('%d.%m.%Y')} (ca. {temp}°C, Wetter: {weather_type_disp}) schlage ich vor:\n" + "\n".join(suggestion)
+        text = f"Für {location} am {dt.strftime('%d.%m.%Y')} (ca. {temp}°C, Wetter: {weather_type_disp}) schlage ich vor:\n" + "\n".join(suggestion)
     else:
-        return f"For {location} on {dt.strftime('%Y-%m-%d')} (about {temp}°C, weather: {weather_type_disp}) I suggest:\n" + "\n".join(suggestion)
+        text = f"For {location} on {dt.strftime('%Y-%m-%d')} (about {temp}°C, weather: {weather_type_disp}) I suggest:\n" + "\n".join(suggestion)
+    return text, suggestion_dict
+
+# Hours of the day whose forecast counts for a trip (the traveller is not outside at night)
+PACKING_DAY_HOURS = range(7, 23)
+# Number of uncovered conditions listed per category in the packing list
+PACKING_MAX_GAPS_SHOWN = 3
 
-def get_packing_list(chat_id, location, start_date, end_date, language="de"):
+def trip_conditions(forecast_days, language="de"):
+    """
+    Turns the structured forecast of a trip (see weather.get_forecast_days) into the distinct
+    (temperature, weather type) conditions the packed clothes have to cover.
+    Uses the hourly forecast during PACKING_DAY_HOURS, or the daily minimum and maximum if there is none.
+    Returns:
+        list: (temp, weather_type, date) tuples, each condition once with the first day it occurs
+    """
+    conditions = {}
+    for day in forecast_days:
+        hours = [h for h in day.get('hours', []) if h['hour'] in PACKING_DAY_HOURS]
+        if hours:
+            day_conditions = [(round(h['temp']), map_weather_type(h['condition'], language)) for h in hours]
+        else:
+            weather_type = map_weather_type(day['condition'], language)
+            day_conditions = [(round(day['min_temp']), weather_type), (round(day['max_temp']), weather_type)]
+        for condition in day_conditions:
+            conditions.setdefault(condition, day['date'])
+    return [(temp, weather_type, date) for (temp, weather_type), date in conditions.items()]
+
+def plan_packing(chat_id, conditions, language="de"):
+    """
+    Computes the fewest items per category that cover all conditions of a trip (greedy weighted set cover).
+    Args:
+        conditions: list of (temp, weather_type, date) tuples, see trip_conditions
+    Returns:
+        list: One line per category
+    """
+    arrays = get_wardrobe_arrays(chat_id, language)
+    packing, missing = outfit_engine.cover(arrays, [c[0] for c in conditions], [c[1] for c in conditions])
+    lines = []
+    for cat, names in packing.items():
+        if not names:
+            if language.startswith("de"):
+                lines.append(f"{cat}: Keine passende {cat.lower()} gefunden.")
+            else:
+                lines.append(f"{cat}: No suitable {cat.lower()} found.")
+            continue
+        line = f"{cat}: {', '.join(names)}"
+        gaps = missing.get(cat, [])
+        if gaps:
+            shown = ", ".join(
+                f"{conditions[i][0]}°C {translate_weather_type(conditions[i][1], language)} "
+                f"({conditions[i][2].strftime('%d.%m.' if language.startswith('de') else '%m-%d')})"
+                for i in gaps[:PACKING_MAX_GAPS_SHOWN])
+            if len(gaps) > PACKING_MAX_GAPS_SHOWN:
+                shown += ", …"
+            line += f" (nicht abgedeckt: {shown})" if language.startswith("de") else f" (not covered: {shown})"
+        lines.append(line)
+    return lines
+
+def get_packing_list(chat_id, location, start_date, end_date, language="de", now=None):
     """
     Suggests a packing list for a trip to a location over a date range.
+    Every hour of the trip's forecast is a condition; per category the fewest items are packed
+    that together fit all conditions (e.g. a jacket for the cold mornings and a T-shirt for the afternoons).
     Args:
         chat_id: Telegram user id
         location: string
         start_date: datetime.date
         end_date: datetime.date
         language: 'de' or 'en'
+        now: datetime the forecast window starts from (default: the current time)
     Returns:
         str: Packing list
     """
-    # Get weather for each day
-    days = [(start_date + datetime.timedelta(days=i)) for i in range((end_date-start_date).days+1)]
-    temps = []
-    weather_types = set()
-    for day in days:
-        forecast = get_weather_forecast_compat(location, datetime.datetime.combine(day, datetime.time(12,0)), language)
-        if forecast and 'temp' in forecast:
-            temps.append(forecast['temp'])
-            if 'weather_type' in forecast:
-                weather_types.add(map_weather_type(forecast['weather_type'], language))
-    if not temps:
+    forecast = weather.get_forecast_days(location, language, start_date, end_date, now=now)
+    if not forecast or not forecast['days']:
         return "Wetterdaten konnten nicht abgerufen werden." if language.startswith("de") else "Could not retrieve weather data."
-    min_temp = min(temps)
-    max_temp = max(temps)
-    _, user_wardrobe = wardrobe.get_or_create_user_wardrobe(chat_id, language)
-    packing = []
-    for cat, items in user_wardrobe.items():
-        filtered = [i for i in items if isinstance(i, dict) and i['min_temp'] <= max_temp and i['max_temp'] >= min_temp and (
-            (isinstance(i.get('weather', 'any'), list) and ('any' in i.get('weather', ['any']) or any(wt in i.get('weather', []) for wt in weather_types))) or
-            (isinstance(i.get('weather', 'any'), str) and (i.get('weather', 'any') == 'any' or i.get('weather', 'any') in weather_types))
-        )]
-        if filtered:
-            filtered.sort(key=lambda x: x['prio'])
-            packing.append(f"{cat}: {filtered[0]['name']}")
+    conditions = trip_conditions(forecast['days'], language)
+    packing = plan_packing(chat_id, conditions, language)
+    min_temp = min(c[0] for c in conditions)
+    max_temp = max(c[0] for c in conditions)
+    weather_disp = ', '.join(sorted({translate_weather_type(c[1], language) for c in conditions}))
+    if language.startswith("de"):
+        text = f"Für {location} ({start_date.strftime('%d.%m.%Y')} bis {end_date.strftime('%d.%m.%Y')}, {min_temp}°C bis {max_temp}°C, Wetter: {weather_disp}) solltest du einpacken:\n" + "\n".join(packing)
+    else:
+        text = f"For {location} ({start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}, {min_temp}°C to {max_temp}°C, weather: {weather_disp}) you should pack:\n" + "\n".join(packing)
+    last_forecast_day = forecast['days'][-1]['date']
+    if last_forecast_day < end_date:
+        if language.startswith("de"):
+            text += f"\n\nFür die Tage nach dem {last_forecast_day.strftime('%d.%m.%Y')} gibt es noch keine Vorhersage."
         else:
-            if language.startswith("de"):
-                packing.append(f"{cat}: Keine passende {cat.lower()} gefunden.")
-            else:
-                packing.append(f"{cat}: No suitable {cat.lower()} found.")
+            text += f"\n\nThere is no forecast yet for the days after {last_forecast_day.strftime('%Y-%m-%d')}."
+    return text
+
+# Number of parallel forecast requests for an itinerary
+ITINERARY_MAX_WORKERS = 8
+# Length in days of a leg without a date, the first leg starts tomorrow (like a plain trip)
+ITINERARY_DEFAULT_LEG_DAYS = 3
+# Phrases separating the legs of an itinerary ("Berlin Mo–Mi, dann München bis Freitag")
+ITINERARY_LEG_SEPARATOR = r"\s*(?:,|;|->|→)?\s*\b(?:und\s+)?(?:dann|danach|anschließend|and\s+then|then|afterwards)\b\s*"
+WEEKDAY_ABBREVIATIONS = {
+    "de": ["mo", "di", "mi", "do", "fr", "sa", "so"],
+    "en": ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+}
+RELATIVE_DAYS = {
+    "de": {"heute": 0, "morgen": 1, "übermorgen": 2},
+    "en": {"today": 0, "tomorrow": 1}
+}
+
+def _itinerary_day_patterns(language):
+    lang = "de" if language.startswith("de") else "en"
+    full = "|".join(WEEKDAY_NAMES[lang] + sorted(RELATIVE_DAYS[lang], key=len, reverse=True))
+    abbreviations = "|".join(WEEKDAY_ABBREVIATIONS[lang])
+    date = r"\d{1,2}\.\d{1,2}\.(?:\d{2,4})?"
+    # Abbreviations ("Mo", "So") are only accepted inside ranges, alone they are too ambiguous
+    any_day = rf"(?:{date}|(?:{full})\b|(?:{abbreviations})\b\.?)"
+    single_day = rf"(?:{date}|\b(?:{full})\b)"
+    return lang, any_day, single_day
+
+def _resolve_day(token, language, reference, today):
+    """
+    Resolves a day of an itinerary (weekday name or abbreviation, relative day, or dd.mm.[yyyy])
+    to the first matching date on or after the reference date. Relative days count from today.
+    """
+    lang = "de" if language.startswith("de") else "en"
+    token = token.lower().strip().rstrip(".") if not re.match(r"\d", token) else token.strip()
+    if token in RELATIVE_DAYS[lang]:
+        return today + datetime.timedelta(days=RELATIVE_DAYS[lang][token])
+    date_match = re.match(r"(\d{1,2})\.(\d{1,2})\.(\d{2,4})?$", token)
+    if date_match:
+        day, month, year = date_match.groups()
+        year = int(year) + (2000 if len(year) == 2 else 0) if year else reference.year
+        try:
+            date = datetime.date(year, int(month), int(day))
+        except ValueError:
+            return None
+        if not date_match.group(3) and date < reference:
+            date = date.replace(year=date.year + 1)
+        return date
+    for names in (WEEKDAY_NAMES[lang], WEEKDAY_ABBREVIATIONS[lang]):
+        if token in names:
+            return reference + datetime.timedelta(days=(names.index(token) - reference.weekday()) % 7)
+    return None
+
+def _leg_location(leg_text, language):
+    # Only a place entity or "in/nach/to <Place>" makes a destination, so names after "dann"/"then"
+    # ("then I meet Anna") do not become legs
+    nlp = nlp_de if language.startswith("de") else nlp_en
+    location = next((ent.text for ent in nlp(leg_text).ents if ent.label_ in ("GPE", "LOC")), None)
+    if location:
+        return location
+    match = re.search(r"\b(?:in|nach|to)\s+([A-ZÄÖÜ][\wäöüß\-]*(?:\s+[A-ZÄÖÜ][\wäöüß\-]*)*)", leg_text)
+    if match:
+        return match.group(1).strip()
+    return None
+
+
+def parse_itinerary(text, language="de", now=None):
+    """
+    Parses a trip with one or more legs, e.g. "Berlin Mo–Mi, dann München bis Freitag"
+    or "Hamburg from Friday to Sunday, then Paris for 3 days".
+    A leg without a start begins the day after the previous leg; a leg without an end lasts
+    ITINERARY_DEFAULT_LEG_DAYS days. The first leg starts tomorrow unless a date is given.
+    Relative days refer to now (default: the current time).
+    Returns:
+        list: (location, start_date, end_date) tuples, empty if no leg has a location
+    """
+    lang, any_day, single_day = _itinerary_day_patterns(language)
+    range_pattern = re.compile(rf"(?:\b(?:von|vom|from)\s+)?({any_day})\s*(?:-|–|—|\bbis\b|\bto\b|\buntil\b|\btill\b)\s*({any_day})", re.IGNORECASE)
+    end_pattern = re.compile(rf"\b(?:bis|until|till)\s+(?:zum\s+|zu\s+)?({any_day})", re.IGNORECASE)
+    start_pattern = re.compile(rf"\b(?:ab|from|von|vom|am|on)\s+({any_day})|({single_day})", re.IGNORECASE)
+    length_pattern = re.compile(r"\b(?:für\s+|for\s+)?(\d+)\s*(?:tage?n?|days?|nächte|nights?)\b", re.IGNORECASE)
+
+    today = (now or datetime.datetime.now()).date()
+    legs = []
+    next_start = today + datetime.timedelta(days=1)
+    for leg_text in re.split(ITINERARY_LEG_SEPARATOR, text, flags=re.IGNORECASE):
+        if not leg_text or not leg_text.strip():
+            continue
+        start = end = None
+        rest = leg_text
+        match = range_pattern.search(rest)
+        if match:
+            start = _resolve_day(match.group(1), lang, next_start if legs else today, today)
+            end = _resolve_day(match.group(2), lang, start, today) if start else None
+            rest = rest[:match.start()] + " " + rest[match.end():]
+        else:
+            match = end_pattern.search(rest)
+            if match:
+                end = _resolve_day(match.group(1), lang, next_start, today)
+                rest = rest[:match.start()] + " " + rest[match.end():]
+            match = start_pattern.search(rest)
+            if match:
+                start = _resolve_day(match.group(1) or match.group(2), lang, next_start if legs else today, today)
+                rest = rest[:match.start()] + " " + rest[match.end():]
+            match = length_pattern.search(rest)
+            if match:
+                length = max(int(match.group(1)), 1)
+                rest = rest[:match.start()] + " " + rest[match.end():]
+                if end is None:
+                    end = (start or next_start) + datetime.timedelta(days=length - 1)
+        location = _leg_location(rest, lang)
+        if not location:
+            continue
+        start = start or next_start
+        if end is None or end < start:
+            end = start + datetime.timedelta(days=ITINERARY_DEFAULT_LEG_DAYS - 1)
+        legs.append((location, start, end))
+        next_start = end + datetime.timedelta(days=1)
+    return legs
+
+def get_itinerary_packing_list(chat_id, legs, language="de", now=None):
+    """
+    Suggests one merged packing list for a trip with several legs.
+    The forecasts of all legs are fetched concurrently, so the answer takes about one forecast round trip
+    regardless of the number of legs; the fewest items covering the conditions of all legs are packed.
+    Args:
+        chat_id: Telegram user id
+        legs: list of (location, start_date, end_date) tuples, see parse_itinerary
+        language: 'de' or 'en'
+        now: datetime the forecast windows start from (default: the current time)
+    Returns:
+        str: Packing list
+    """
+    with ThreadPoolExecutor(max_workers=min(len(legs), ITINERARY_MAX_WORKERS)) as pool:
+        forecasts = list(pool.map(lambda leg: weather.get_forecast_days(leg[0], language, leg[1], leg[2], now=now), legs))
+    conditions = []
+    leg_lines = []
+    for (location, start_date, end_date), forecast in zip(legs, forecasts):
+        if language.startswith("de"):
+            dates = f"{start_date.strftime('%d.%m.')} bis {end_date.strftime('%d.%m.')}"
+        else:
+            dates = f"{start_date.strftime('%m-%d')} to {end_date.strftime('%m-%d')}"
+        if not forecast or not forecast['days']:
+            leg_lines.append(f"📍 {location} ({dates}): " + ("keine Wetterdaten" if language.startswith("de") else "no weather data"))
+            continue
+        leg_conditions = trip_conditions(forecast['days'], language)
+        conditions.extend(leg_conditions)
+        min_temp = min(c[0] for c in leg_conditions)
+        max_temp = max(c[0] for c in leg_conditions)
+        leg_lines.append(f"📍 {forecast['location']} ({dates}): {min_temp}°C – {max_temp}°C")
+    if not conditions:
+        return "Wetterdaten konnten nicht abgerufen werden." if language.startswith("de") else "Could not retrieve weather data."
+    packing = plan_packing(chat_id, conditions, language)
     if language.startswith("de"):
-        return f"Für {location} ({start_date.strftime('%d.%m.%Y')} bis {end_date.strftime('%d.%m.%Y')}, {min_temp}°C bis {max_temp}°C, Wetter: {', '.join(weather_types)}) solltest du einpacken:\n" + "\n".join(packing)
+        return "Deine Reise:\n" + "\n".join(leg_lines) + "\n\nDafür solltest du einpacken:\n" + "\n".join(packing)
     else:
-        return f"For {location} ({start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}, {min_temp}°C to {max_temp}°C, weather: {', '.join(weather_types)}) you should pack:\n" + "\n".join(packing)
+        return "Your trip:\n" + "\n".join(leg_lines) + "\n\nYou should pack:\n" + "\n".join(packing)
 
 def needs_outfit_change(chat_id, location, date, language="de"):
     """
@@ -168,7 +552,7 @@ def needs_outfit_change(chat_id, location, date, language="de"):
         else:
             return f"The temperature and weather in {location} on {date.strftime('%Y-%m-%d')} is relatively stable. No change of clothes needed."
 
-def handle_packing(bot, message, text, language):
+def handle_packing(bot, message, text, language, doc=None, now=None):
     """
     Interprets the user's packing-related input and calls the appropriate packing function.
     Uses spaCy for fast entity extraction (location, date).
@@ -177,14 +561,18 @@ def handle_packing(bot, message, text, language):
         message: The message object (for chat_id)
         text (str): The user's message text.
         language (str): The detected language code ('de' or 'en').
+        doc: The spaCy doc of the text if it is already parsed.
+        now (datetime): Reference time for relative dates, defaults to the current time.
     Returns:
         str: The packing/outfit recommendation or error message.
     """
     import re
     chat_id = message.chat.id
     text_lower = text.lower()
-    nlp = nlp_de if language.startswith("de") else nlp_en
-    doc = nlp(text)
+    if doc is None:
+        nlp = nlp_de if language.startswith("de") else nlp_en
+        doc = nlp(text)
+    now = now or datetime.datetime.now()
 
     # --- Location Extraction ---
     location = next((ent.text for ent in doc.ents if ent.label_ in ("GPE", "LOC", "ORG")), None)
@@ -204,20 +592,20 @@ def handle_packing(bot, message, text, language):
         if ent.label_ == "DATE":
             ent_text = ent.text.lower()
             if any(w in ent_text for w in ["übermorgen", "the day after tomorrow"]):
-                dt = datetime.datetime.now() + datetime.timedelta(days=2)
+                dt = now + datetime.timedelta(days=2)
             elif any(w in ent_text for w in ["morgen", "tomorrow"]):
-                dt = datetime.datetime.now() + datetime.timedelta(days=1)
+                dt = now + datetime.timedelta(days=1)
             elif any(w in ent_text for w in ["heute", "today"]):
-                dt = datetime.datetime.now()
+                dt = now
             # TODO: smarter date parsing (z.B. mit dateparser)
             break
     if not dt:
         if any(w in text_lower for w in ["übermorgen", "the day after tomorrow"]):
-            dt = datetime.datetime.now() + datetime.timedelta(days=2)
+            dt = now + datetime.timedelta(days=2)
         elif any(w in text_lower for w in ["morgen", "tomorrow"]):
-            dt = datetime.datetime.now() + datetime.timedelta(days=1)
+            dt = now + datetime.timedelta(days=1)
         elif any(w in text_lower for w in ["heute", "today"]):
-            dt = datetime.datetime.now()
+            dt = now
 
     # --- Intent/Type Extraction ---
     trip_keywords = ["reise", "ausflug", "trip", "urlaub", "weekend"]
@@ -226,16 +614,22 @@ def handle_packing(bot, message, text, language):
     is_change = any(w in text_lower for w in change_keywords)
 
     # --- Decision Logic ---
+    legs = parse_itinerary(text, language, now) if is_trip or re.search(ITINERARY_LEG_SEPARATOR, text, re.IGNORECASE) else []
+    if len(legs) > 1:
+        return get_itinerary_packing_list(chat_id, legs, language, now)
     if is_trip:
-        start_date = (datetime.datetime.now() + datetime.timedelta(days=1)).date()
-        end_date = start_date + datetime.timedelta(days=2)
-        return get_packing_list(chat_id, location, start_date, end_date, language)
+        if legs:
+            _, start_date, end_date = legs[0]
+        else:
+            start_date = (now + datetime.timedelta(days=1)).date()
+            end_date = start_date + datetime.timedelta(days=2)
+        return get_packing_list(chat_id, location, start_date, end_date, language, now)
     if is_change:
         if not dt:
-            dt = datetime.datetime.now()
+            dt = now
         return needs_outfit_change(chat_id, location, dt.date(), language)
     if not dt:
-        dt = datetime.datetime.now()
+        dt = now
     return get_outfit_suggestion(chat_id, location, dt, language)
 
 def map_weather_type(raw_weather_type, language="de"):
@@ -290,38 +684,138 @@ def translate_weather_type(weather_type, language):
     lang = "de" if language.startswith("de") else "en"
     return mapping[lang].get(weather_type, weather_type)
 
+# File with the last outfit suggestion of every user, written in the background
+SUGGESTION_CONTEXT_FILE = "suggestion_context.json"
+# Number of users whose last suggestion is kept in memory, the least recently used are evicted
+SUGGESTION_CONTEXT_CACHE_SIZE = 5000
+# Interval in seconds for writing pending suggestion contexts to the file
+SUGGESTION_CONTEXT_FLUSH_INTERVAL = 5
+
+class SuggestionContextStore:
+    """
+    In-memory store for the last outfit suggestion (with weather context) of every user.
+    Saving only updates memory; new contexts are collected and merged into the file in one batch
+    by a background thread (atomic rename), so a suggestion no longer rewrites the whole file.
+    Recently used contexts are kept in an LRU cache, evicted users are read back from the file on demand.
+    """
+
+    def __init__(self, path=SUGGESTION_CONTEXT_FILE, cache_size=SUGGESTION_CONTEXT_CACHE_SIZE,
+                 flush_interval=SUGGESTION_CONTEXT_FLUSH_INTERVAL):
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._cache = OrderedDict()
+        # Contexts not yet written to the file, never evicted before the next flush
+        self._pending = {}
+        # Serializes the read-merge-write of whole flushes, so two flushes (shutdown and background)
+        # cannot both merge into the old file and drop each other's contexts
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        return json.loads(content) if content else {}
+
+    def _remember(self, chat_id, context):
+        self._cache[chat_id] = context
+        self._cache.move_to_end(chat_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, chat_id):
+        """
+        Returns the last suggestion context of a user, or None.
+        """
+        chat_id = str(chat_id)
+        with self.lock:
+            if chat_id in self._cache:
+                self._cache.move_to_end(chat_id)
+                return self._cache[chat_id]
+            if chat_id in self._pending:
+                return self._pending[chat_id]
+        context = self._read_file().get(chat_id)
+        if context is not None:
+            with self.lock:
+                # A newer context may have been saved while reading the file
+                if chat_id not in self._cache and chat_id not in self._pending:
+                    self._remember(chat_id, context)
+        return context
+
+    def put_many(self, contexts):
+        """
+        Stores the contexts (dict chat_id -> context) of one or more users and marks them for the next flush.
+        """
+        with self.lock:
+            for chat_id, context in contexts.items():
+                chat_id = str(chat_id)
+                self._pending[chat_id] = context
+                self._remember(chat_id, context)
+            self._start_flusher()
+
+    def flush(self):
+        """
+        Merges the pending contexts into the file, if there are any.
+        """
+        with self._flush_lock:
+            with self.lock:
+                if not self._pending:
+                    return
+                pending = self._pending
+                self._pending = {}
+            try:
+                data = self._read_file()
+                data.update(pending)
+                atomic_write_json(self.path, data)
+            except Exception:
+                with self.lock:
+                    # Keep contexts saved in the meantime, they are newer
+                    self._pending = {**pending, **self._pending}
+                raise
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="suggestion-context-flush", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[SuggestionContextStore] Flush failed: {e}")
+
+# Shared suggestion context store, flushed on shutdown
+_suggestion_contexts = SuggestionContextStore()
+atexit.register(_suggestion_contexts.flush)
+
 def save_last_suggestion_with_context(chat_id, suggestion_dict, temp, weather_type):
-    """Save the last outfit suggestion with weather context for a user (per chat_id) to suggestion_context.json."""
+    """Save the last outfit suggestion with weather context for a user (per chat_id), written to suggestion_context.json in the background."""
+    save_last_suggestions_with_context({chat_id: (suggestion_dict, temp, weather_type)})
+
+def save_last_suggestions_with_context(contexts):
+    """Save the last outfit suggestions of many users (dict chat_id -> (suggestion_dict, temp, weather_type)) in one batch."""
     try:
-        # Load existing data
-        if os.path.exists("suggestion_context.json"):
-            with open("suggestion_context.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
-            data = {}
-        
-        # Save suggestion with context for this user
-        data[str(chat_id)] = {
-            'suggestions': suggestion_dict,
-            'temp': temp,
-            'weather_type': weather_type
-        }
-        
-        # Write back to file
-        with open("suggestion_context.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        _suggestion_contexts.put_many({
+            chat_id: {
+                'suggestions': suggestion_dict,
+                'temp': temp,
+                'weather_type': weather_type
+            }
+            for chat_id, (suggestion_dict, temp, weather_type) in contexts.items()
+        })
     except Exception as e:
-        print(f"[save_last_suggestion_with_context] Error: {e}")
+        print(f"[save_last_suggestions_with_context] Error: {e}")
 
 def load_last_suggestion(chat_id):
-    """Load the last outfit suggestion for a user (per chat_id) from suggestion_context.json."""
+    """Load the last outfit suggestion for a user (per chat_id), served from memory."""
     try:
-        if os.path.exists("suggestion_context.json"):
-            with open("suggestion_context.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data.get(str(chat_id), None)
-        else:
-            return None
+        return _suggestion_contexts.get(chat_id)
     except Exception as e:
         print(f"[load_last_suggestion] Error: {e}")
         return None
@@ -360,63 +854,47 @@ def handle_preference_feedback(chat_id, user_message, language="de"):
         return ("Ich konnte kein Kleidungsstück erkennen. Bitte formuliere deinen Wunsch klarer (z.B. 'Ich möchte lieber ein T-Shirt anziehen')."
                 if language.startswith("de") else
                 "I couldn't detect a clothing item. Please specify your wish more clearly (e.g. 'I would rather wear a T-shirt').")
-    # Find item in wardrobe
-    _, user_wardrobe = wardrobe.get_or_create_user_wardrobe(chat_id, language)
-    found = False
-    found_cat = None
-    for cat, items in user_wardrobe.items():
-        for item in items:
-            if isinstance(item, dict) and preferred_item.lower() == item['name'].lower():
-                found = True
-                found_cat = cat
-                break
-        if found:
-            break
-    if not found:
-        # Give user instructions to add the item to their wardrobe
-        if language.startswith("de"):
-            return (f"Ich habe '{preferred_item}' nicht in deinem Kleiderschrank gefunden. "
-                    f"Du kannst es hinzufügen, indem du /kleiderschrank eingibst und es dort hinzufügst")
-                    # TODO or via natural language 
-        else:
-            return (f"I couldn't find '{preferred_item}' in your wardrobe. "
-                    f"You can add it by entering /wardrobe and adding it there.")
-                    # TODO or via natural language
-    # Update priorities, temperature ranges, and weather for preferred item
-    current_suggested = last_suggestion.get(found_cat)
-    prios = [item['prio'] for item in user_wardrobe[found_cat] if isinstance(item, dict) and 'prio' in item]
-    min_prio = min(prios) if prios else 0
-    
-    for item in user_wardrobe[found_cat]:
-        if isinstance(item, dict):
-            if item['name'].lower() == preferred_item.lower():
+    # Find and update the item under the store lock, the background flush may be serializing the same items
+    with wardrobe.wardrobe_lock():
+        _, user_wardrobe = wardrobe.get_or_create_user_wardrobe(chat_id, language)
+        found_cat, _ = wardrobe.find_item_in_wardrobe(user_wardrobe, preferred_item)
+        if not found_cat:
+            # Give user instructions to add the item to their wardrobe
+            if language.startswith("de"):
+                return (f"Ich habe '{preferred_item}' nicht in deinem Kleiderschrank gefunden. "
+                        f"Du kannst es hinzufügen, indem du /kleiderschrank eingibst und es dort hinzufügst")
+                        # TODO or via natural language 
+            else:
+                return (f"I couldn't find '{preferred_item}' in your wardrobe. "
+                        f"You can add it by entering /wardrobe and adding it there.")
+                        # TODO or via natural language
+        # Update priorities, temperature ranges, and weather for preferred item
+        current_suggested = last_suggestion.get(found_cat)
+        prios = [item.prio for item in user_wardrobe[found_cat]]
+        min_prio = min(prios) if prios else 0
+        preferred_key = normalize_name(preferred_item)
+
+        for item in user_wardrobe[found_cat]:
+            if item.key == preferred_key:
                 # Update priority (always lowest)
-                item['prio'] = min_prio - 1
-                
+                item.prio = min_prio - 1
+
                 # Update temperature range (expand to include current temp)
-                if current_temp < item.get('min_temp', 0):
-                    item['min_temp'] = current_temp
-                if current_temp > item.get('max_temp', 50):
-                    item['max_temp'] = current_temp
-                
-                # Update weather (add current weather to list if not already present)
-                current_weather_list = item.get('weather', ['any'])
-                if isinstance(current_weather_list, str):
-                    # Convert old string format to list
-                    current_weather_list = [current_weather_list] if current_weather_list != 'any' else ['any']
-                
-                if current_weather not in current_weather_list and current_weather != 'any':
-                    if 'any' in current_weather_list:
-                        # If 'any' is present, replace it with specific weather types
-                        current_weather_list = [current_weather]
+                if current_temp < item.min_temp:
+                    item.min_temp = current_temp
+                if current_temp > item.max_temp:
+                    item.max_temp = current_temp
+
+                # Update weather (add current weather if not already present)
+                weather_bit = WEATHER_BITS.get(current_weather, 0)
+                if current_weather != 'any' and weather_bit and not item.weather & weather_bit:
+                    if item.weather & ANY_BIT:
+                        # If 'any' is present, replace it with the specific weather type
+                        item.weather = weather_bit
                     else:
-                        current_weather_list.append(current_weather)
-                
-                item['weather'] = current_weather_list
-    # Save updated wardrobe
-    data = wardrobe.load_wardrobe()
-    data[str(chat_id)][0] = user_wardrobe
-    wardrobe.save_wardrobe(data)
+                        item.weather |= weather_bit
+        # Save updated wardrobe (marks the user as changed, the store writes it back in the background)
+        wardrobe.save_user_wardrobe(chat_id, user_wardrobe)
     return (f"Ich habe '{preferred_item}' priorisiert und an die aktuellen Bedingungen angepasst (Temperatur: {current_temp}°C, Wetter: {translate_weather_type(current_weather, language)}). Es wird dir beim nächsten Mal bevorzugt vorgeschlagen."
             if language.startswith("de") else
             f"I've prioritized '{preferred_item}' and adapted it to current conditions (Temperature: {current_temp}°C, Weather: {translate_weather_type(current_weather, language)}). It will be suggested to you next time.")
\ No newline at end of file
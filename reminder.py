@@ -12,6 +12,13 @@ import time
 from datetime import datetime, timedelta
 import re
 from rapidfuzz import fuzz
+from delivery import executor as delivery_executor
+
+# Catch-up delivery: after a restart or a stalled check loop, reminders that are overdue
+# by less than this many minutes are still sent (marked as late) instead of being dropped.
+CATCH_UP_GRACE_MINUTES = 120
+# A gap between two reminder scans longer than this is treated as a stall.
+STALL_THRESHOLD_SECONDS = 90
 
 '''
 A helper function to normalize the time string.
@@ -53,6 +60,120 @@ def normalize_time_string(time_str):
         return f"{hour:02d}:00"
     return None
 
+WEEKDAY_NAMES = {
+    "de": ["montag", "dienstag", "mittwoch", "donnerstag", "freitag", "samstag", "sonntag"],
+    "en": ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+}
+
+# Recurrence phrases, checked in order. Each entry maps a regex to a function building the rule.
+# A rule is stored as a small RRULE-like dict: {"freq": "hourly"|"daily"|"weekly", "interval": N, "weekdays": [0-6]}
+RECURRENCE_PATTERNS = {
+    "de": [
+        (r"\b(?:jeden|an)\s+werktag(?:en)?\b|\bwerktags\b",
+         lambda m: {"freq": "weekly", "interval": 1, "weekdays": [0, 1, 2, 3, 4]}),
+        (r"\bjeden\s+(" + "|".join(WEEKDAY_NAMES["de"]) + r")\b|\b(" + "|".join(WEEKDAY_NAMES["de"]) + r")s\b",
+         lambda m: {"freq": "weekly", "interval": 1, "weekdays": [WEEKDAY_NAMES["de"].index(m.group(1) or m.group(2))]}),
+        (r"\balle\s+(\d+)\s*stunden\b", lambda m: {"freq": "hourly", "interval": int(m.group(1)), "weekdays": []}),
+        (r"\b(?:jede\s+stunde|stündlich)\b", lambda m: {"freq": "hourly", "interval": 1, "weekdays": []}),
+        (r"\balle\s+(\d+)\s*tage\b", lambda m: {"freq": "daily", "interval": int(m.group(1)), "weekdays": []}),
+        (r"\b(?:jeden\s+(?:tag|morgen|abend)|täglich)\b", lambda m: {"freq": "daily", "interval": 1, "weekdays": []}),
+        (r"\b(?:jede\s+woche|wöchentlich)\b", lambda m: {"freq": "weekly", "interval": 1, "weekdays": []}),
+    ],
+    "en": [
+        (r"\bevery\s+weekday\b|\bon\s+weekdays\b|\bweekdays\b",
+         lambda m: {"freq": "weekly", "interval": 1, "weekdays": [0, 1, 2, 3, 4]}),
+        (r"\bevery\s+(" + "|".join(WEEKDAY_NAMES["en"]) + r")\b|\b(" + "|".join(WEEKDAY_NAMES["en"]) + r")s\b",
+         lambda m: {"freq": "weekly", "interval": 1, "weekdays": [WEEKDAY_NAMES["en"].index(m.group(1) or m.group(2))]}),
+        (r"\bevery\s+(\d+)\s*hours\b", lambda m: {"freq": "hourly", "interval": int(m.group(1)), "weekdays": []}),
+        (r"\b(?:every\s+hour|hourly)\b", lambda m: {"freq": "hourly", "interval": 1, "weekdays": []}),
+        (r"\bevery\s+(\d+)\s*days\b", lambda m: {"freq": "daily", "interval": int(m.group(1)), "weekdays": []}),
+        (r"\b(?:every\s+(?:day|morning|evening)|daily)\b", lambda m: {"freq": "daily", "interval": 1, "weekdays": []}),
+        (r"\b(?:every\s+week|weekly)\b", lambda m: {"freq": "weekly", "interval": 1, "weekdays": []}),
+    ]
+}
+
+"""
+Helper to find a recurrence phrase ("jeden Montag", "every weekday", "alle 2 Stunden", ...) in the text.
+Returns the rule and the regex match, or (None, None) if the reminder is a one-shot reminder.
+
+----
+
+Args:
+    text_lower (str): The lower-cased input text.
+    language (str): The language of the input text ('de' for German, 'en' for English).
+"""
+def _match_recurrence(text_lower, language):
+    lang_key = "de" if language.startswith("de") else "en"
+    for pattern, build_rule in RECURRENCE_PATTERNS[lang_key]:
+        match = re.search(pattern, text_lower)
+        if match:
+            rule = build_rule(match)
+            if rule["interval"] < 1:
+                return None, None
+            return rule, match
+    return None, None
+
+"""
+Parse a recurrence rule from the text.
+Returns a dict like {"freq": "weekly", "interval": 1, "weekdays": [0]} or None for one-shot reminders.
+
+----
+
+Args:
+    text (str): The input text.
+    language (str): The language of the input text ('de' for German, 'en' for English).
+"""
+def parse_recurrence(text, language):
+    rule, _ = _match_recurrence(text.lower(), language)
+    return rule
+
+"""
+Helper to check whether a datetime is a valid occurrence day for a rule.
+Weekly rules without explicit weekdays repeat on any day (the weekday is fixed by the first occurrence).
+"""
+def _matches_rule_day(rule, dt):
+    weekdays = rule.get("weekdays") or []
+    return not weekdays or dt.weekday() in weekdays
+
+"""
+Compute the next occurrence of a recurring reminder strictly after `now`.
+Only this single occurrence is ever materialized, so storage and scan cost grow with the number of rules.
+Missed occurrences (e.g. after downtime) are skipped.
+
+----
+
+Args:
+    rule (dict): The recurrence rule.
+    previous (datetime): The previous (or first) occurrence; its clock time is kept.
+    now (datetime): The reference time, defaults to datetime.now().
+"""
+def next_occurrence(rule, previous, now=None):
+    now = now or datetime.now()
+    interval = max(1, int(rule.get("interval", 1)))
+    if rule["freq"] in ("hourly", "daily"):
+        step = timedelta(hours=interval) if rule["freq"] == "hourly" else timedelta(days=interval)
+        if previous > now:
+            return previous + step
+        steps = int((now - previous) / step) + 1
+        return previous + steps * step
+    # weekly: walk forward day by day (at most one week) on the previous occurrence's clock time
+    weekdays = rule.get("weekdays") or [previous.weekday()]
+    candidate = max(previous, now).replace(hour=previous.hour, minute=previous.minute, second=0, microsecond=0)
+    for _ in range(8):
+        if candidate > now and candidate > previous and candidate.weekday() in weekdays:
+            return candidate
+        candidate += timedelta(days=1)
+    return candidate
+
+"""
+Compute the first occurrence of a recurring reminder from the time the user gave.
+If the given time already passed or is not on a matching weekday, the next matching occurrence is used.
+"""
+def _first_occurrence(rule, candidate, now):
+    if candidate > now and _matches_rule_day(rule, candidate):
+        return candidate
+    return next_occurrence(rule, candidate, now)
+
 """
 Parse a time expression from the text.
 This function extracts time expressions from the text and returns them in a normalized format.
@@ -62,15 +183,22 @@ This function extracts time expressions from the text and returns them in a norm
 Args:
     text (str): The input text containing time expressions.
     language (str): The language of the input text ('de' for German, 'en' for English).
+    now (datetime): The time relative expressions refer to, defaults to datetime.now().
 """
-def parse_time_expression(text, language):
+def parse_time_expression(text, language, now=None):
     """
     Extracts and normalizes time expressions from the text.
     Returns a string in 'YYYY-MM-DD HH:MM' (24h) format.
     """
-    now = datetime.now()
+    now = now or datetime.now()
     text_lower = text.lower()
 
+    # Recurrence phrases ("jeden Montag", "every weekday", "jeden Morgen") only determine the first occurrence.
+    # Remove them so e.g. "jeden Morgen" is not read as "morgen" (tomorrow).
+    recurrence, recurrence_match = _match_recurrence(text_lower, language)
+    if recurrence_match:
+        text_lower = text_lower[:recurrence_match.start()] + " " + text_lower[recurrence_match.end():]
+
     # 0. Relative day expressions
     day_offset = 0
     # German
@@ -133,8 +261,19 @@ def parse_time_expression(text, language):
             if 0 <= hour <= 23 and 0 <= minute <= 59:
                 # Use day offset if present
                 target_date = now + timedelta(days=day_offset)
+                if recurrence:
+                    candidate = target_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                    return _first_occurrence(recurrence, candidate, now).strftime("%Y-%m-%d %H:%M")
                 return f"{target_date.strftime('%Y-%m-%d')} {hour:02d}:{minute:02d}"
 
+    # Hourly rules without an explicit start time start one interval from now
+    if recurrence and recurrence["freq"] == "hourly":
+        return (now + timedelta(hours=recurrence["interval"])).strftime("%Y-%m-%d %H:%M")
+    # Other rules need a clock time ("jeden Montag um 8 Uhr"); without one the user is asked for it,
+    # the fallback below would store a one-shot time that ignores the rule
+    if recurrence:
+        return None
+
     # 3. spaCy fallback (TIME/DATE)
     nlp = nlp_de if language == "de" else nlp_en
     doc = nlp(text)
@@ -191,14 +330,15 @@ Uses spaCy to remove time/date entities and strips common reminder phrases.
 Args:
     text (str): The input text containing the reminder information.
     language (str): The language of the input text, either "de" for German or "en" for English.
+    now (datetime): The time relative expressions refer to, defaults to datetime.now().
 '''
-def extract_reminder_info(text, language):
+def extract_reminder_info(text, language, now=None):
     """
     Extracts the time and the actual reminder content ("what") from the input text.
     Uses regex patterns to remove time/date entities and strips common reminder phrases.
     """
     original_text = text
-    time_str = parse_time_expression(text, language)
+    time_str = parse_time_expression(text, language, now)
     
     # Start with the original text
     what = text
@@ -260,6 +400,10 @@ def extract_reminder_info(text, language):
         r"\bam\s+\d",   # but be careful with "am Meeting"
     ]
     
+    # Recurrence phrases ("jeden Montag", "every weekday", ...) go first, so "jeden Morgen" is removed as a whole
+    lang_key = "de" if language.startswith("de") else "en"
+    time_patterns = [pattern for pattern, _ in RECURRENCE_PATTERNS[lang_key]] + time_patterns
+
     for pattern in time_patterns:
         what = re.sub(pattern, "", what, flags=re.IGNORECASE)
     
@@ -311,8 +455,9 @@ Args:
     time_str (str): The time when the reminder should be sent.
     what (str): The content of the reminder.
     language (str): The language of the reminder.
+    recurrence (dict): Optional recurrence rule, stored once instead of one entry per occurrence.
 """
-def save_reminder(chat_id, time_str, what, language):
+def save_reminder(chat_id, time_str, what, language, recurrence=None):
     """
     Save the reminder information to a JSON file.
     
@@ -321,6 +466,7 @@ def save_reminder(chat_id, time_str, what, language):
         time_str (str): The time when the reminder should be sent (already in correct format).
         what (str): The content of the reminder.
         language (str): The language of the reminder.
+        recurrence (dict): Optional recurrence rule (see parse_recurrence).
     """
     reminders_file = "reminders.json"
     reminders = {}
@@ -351,11 +497,14 @@ def save_reminder(chat_id, time_str, what, language):
     # Add the new reminder to the list for this chat_id
     if str(chat_id) not in reminders:
         reminders[str(chat_id)] = []
-    reminders[str(chat_id)].append({
+    entry = {
         "time": norm_time,
         "what": what,
         "language": language
-    })
+    }
+    if recurrence:
+        entry["recurrence"] = recurrence
+    reminders[str(chat_id)].append(entry)
 
     # Save the updated reminders back to the file
     with open(reminders_file, "w", encoding="utf-8") as f:
@@ -405,6 +554,37 @@ def format_reminder_time(timestr, language):
         else:
             return f"on {dt.strftime('%b %d')} at {time_part}"
 
+"""
+Helper function to describe a recurrence rule in the response message, e.g. "jeden Montag um 08:00".
+
+----
+
+Args:
+    rule (dict): The recurrence rule.
+    timestr (str): The first occurrence ('YYYY-MM-DD HH:MM').
+    language (str): The language of the response ('de' for German, 'en' for English).
+"""
+def format_recurrence(rule, timestr, language):
+    dt = datetime.strptime(timestr, "%Y-%m-%d %H:%M")
+    time_part = dt.strftime("%H:%M")
+    lang_key = "de" if language.startswith("de") else "en"
+    interval = rule.get("interval", 1)
+    weekdays = rule.get("weekdays") or []
+    if rule["freq"] == "hourly":
+        if lang_key == "de":
+            return "jede Stunde" if interval == 1 else f"alle {interval} Stunden"
+        return "every hour" if interval == 1 else f"every {interval} hours"
+    if rule["freq"] == "daily":
+        if lang_key == "de":
+            return f"täglich um {time_part}" if interval == 1 else f"alle {interval} Tage um {time_part}"
+        return f"every day at {time_part}" if interval == 1 else f"every {interval} days at {time_part}"
+    if weekdays == [0, 1, 2, 3, 4]:
+        return f"werktags um {time_part}" if lang_key == "de" else f"every weekday at {time_part}"
+    names = [WEEKDAY_NAMES[lang_key][d].capitalize() for d in (weekdays or [dt.weekday()])]
+    if lang_key == "de":
+        return f"jeden {', '.join(names)} um {time_part}"
+    return f"every {', '.join(names)} at {time_part}"
+
 """
 Handle the reminder command.
 This function is called when the intent of the user is found to be reminder.
@@ -417,39 +597,98 @@ Args:
     message: The message object containing user input.
     text: The text of the message.
     language: The language of the message.
+    now: The time the message was sent, relative times ("in 10 minutes") refer to it.
 """
-def handle_reminder(bot, message, text, language):
+def handle_reminder(bot, message, text, language, now=None):
     print(f"handle_reminder called with text: {text}, language: {language}")
-    time_str, what = extract_reminder_info(text, language)
+    time_str, what = extract_reminder_info(text, language, now)
     print(f"Extracted time: {time_str}, what: {what}")
     if not what or what.strip() == "":
         if language == "de":
             return "Bitte gib an, woran ich dich erinnern soll."
         else:
             return "Please specify what I should remind you about."
+    recurrence = parse_recurrence(text, language)
     if time_str:
-        errorcode = save_reminder(message.chat.id, time_str, what, language)
+        errorcode = save_reminder(message.chat.id, time_str, what, language, recurrence)
         if errorcode == 1:
             if language == "de":
                 return "Die Uhrzeit ist nicht im richtigen Format. Bitte versuche es erneut."
             else:
                 return "The time is not in the correct format. Please try again."
         else:
+            when = format_recurrence(recurrence, time_str, language) if recurrence else format_reminder_time(time_str, language)
             if language == "de":
-                return f"Okay, ich werde dich {format_reminder_time(time_str, language)} daran erinnern, {what}"
+                return f"Okay, ich werde dich {when} daran erinnern, {what}"
             else:
-                return f"Okay, I will remind you {format_reminder_time(time_str, language)} to {what}"
+                return f"Okay, I will remind you {when} to {what}"
     else:
         if language == "de":
             return "Bitte gib eine Uhrzeit an, wann ich dich erinnern soll."
         else:
             return "Please specify a time when I should remind you."
 
+"""
+Build the text of a reminder notification.
+Reminders delivered by the catch-up mode are marked as late together with their original due time.
+
+----
+
+Args:
+    reminder (dict): The stored reminder (time, what, language).
+    late (bool): Whether the reminder is delivered after its due time.
+"""
+def format_reminder_message(reminder, late=False):
+    if not late:
+        if reminder["language"] == "de":
+            return f"Erinnerung: {reminder['what']}"
+        return f"Reminder: {reminder['what']}"
+    due = format_reminder_time(reminder["time"], reminder["language"])
+    if reminder["language"] == "de":
+        return f"Verspätete Erinnerung (fällig {due}): {reminder['what']}"
+    return f"Late reminder (due {due}): {reminder['what']}"
+
+"""
+Send a reminder that was missed, marked as late.
+Runs on the delivery executor, so the send goes through the scheduled lane of the outbound queue,
+whose token buckets keep a large backlog within Telegram's limits.
+
+----
+
+Args:
+    bot: The telebot instance.
+    chat_id: The chat id of the user.
+    reminder (dict): The reminder as stored in reminders.json.
+"""
+def send_late_reminder(bot, chat_id, reminder):
+    try:
+        bot.send_message(chat_id, format_reminder_message(reminder, late=True))
+    except Exception as e:
+        print(f"Failed to send late reminder to chat {chat_id}: {e}")
+
 """
 Check reminders periodically and send notifications.
 This function runs in a separate thread to avoid blocking the main bot loop.
+
+On startup, and whenever the loop has stalled for longer than STALL_THRESHOLD_SECONDS
+(e.g. a long GC pause or a suspended host), the check runs in catch-up mode:
+reminders that are overdue by less than the grace window are still delivered, marked as late,
+one delivery each, paced by the outbound rate limits. Outside of catch-up mode only reminders
+due within the current minute are sent; older ones are dropped as before.
+Reminders the delivery queue does not accept (queue full) stay stored unchanged
+and are sent by the next scan, which then runs in catch-up mode.
+Recurring reminders are not removed but moved to their next occurrence.
+
+----
+
+Args:
+    bot: The telebot instance.
+    grace_minutes (int): How long after its due time a reminder may still be delivered in catch-up mode.
 """
-def check_reminders(bot):
+def check_reminders(bot, grace_minutes=CATCH_UP_GRACE_MINUTES):
+    last_scan = None
+    # Set when the delivery queue rejected a reminder, the next scan catches up on the ones kept
+    deferred = False
     while True:
         try:
             with open("reminders.json", "r", encoding="utf-8") as f:
@@ -457,6 +696,13 @@ def check_reminders(bot):
         except (FileNotFoundError, json.JSONDecodeError):
             reminders = {}
 
+        scan_started = datetime.now()
+        catch_up = deferred or last_scan is None or (scan_started - last_scan).total_seconds() > STALL_THRESHOLD_SECONDS
+        if catch_up:
+            print(f"Reminder check running in catch-up mode (grace window: {grace_minutes} min)")
+
+        late_count = 0
+        deferred = False
         changed = False
         for chat_id, reminder_list in list(reminders.items()):
             for reminder in reminder_list[:]:  # copy the list to avoid modifying it while iterating
@@ -465,23 +711,45 @@ def check_reminders(bot):
                     now_dt = datetime.now()
                     reminder_dt = datetime.strptime(reminder_time, "%Y-%m-%d %H:%M")
                     if now_dt >= reminder_dt:
-                        # Only send if is now (±1 minute)
-                        if 0 <= (now_dt - reminder_dt).total_seconds() < 60:
-                            if reminder["language"] == "de":
-                                bot.send_message(chat_id, f"Erinnerung: {reminder['what']}")
+                        overdue_seconds = (now_dt - reminder_dt).total_seconds()
+                        # Only send if is now (±1 minute), or still within the grace window when catching up
+                        late = overdue_seconds >= 60
+                        if not late or (catch_up and overdue_seconds < grace_minutes * 60):
+                            # Sending happens on the delivery executor, so slow HTTP calls don't delay the scan.
+                            # Once the queue stayed full, the remaining reminders are not tried in this scan.
+                            if deferred:
+                                continue
+                            if late:
+                                # One delivery per reminder, the outbound queue spreads them within the rate limits
+                                queued = delivery_executor.submit(send_late_reminder, bot, chat_id, dict(reminder))
+                                late_count += queued
                             else:
-                                bot.send_message(chat_id, f"Reminder: {reminder['what']}")
-                        # delete the reminder after sending
-                        print(f"Removing reminder for chat {chat_id}: {reminder['what']} at {reminder_time}")
-                        reminder_list.remove(reminder)
+                                queued = delivery_executor.submit(bot.send_message, chat_id, format_reminder_message(reminder))
+                            if not queued:
+                                # Kept unchanged, so it is sent by the next scan instead of being lost
+                                deferred = True
+                                continue
+                        if reminder.get("recurrence"):
+                            # Recurring reminders stay stored as one rule, only the next occurrence is expanded
+                            reminder["time"] = next_occurrence(reminder["recurrence"], reminder_dt, now_dt).strftime("%Y-%m-%d %H:%M")
+                            print(f"Rescheduling reminder for chat {chat_id}: {reminder['what']} at {reminder['time']}")
+                        else:
+                            # delete the reminder after sending
+                            print(f"Removing reminder for chat {chat_id}: {reminder['what']} at {reminder_time}")
+                            reminder_list.remove(reminder)
                         changed = True
                 except Exception as e:
                     print(e)
             if not reminder_list:
                 del reminders[chat_id]
+        if late_count:
+            print(f"Catching up on {late_count} overdue reminder(s)")
+        if deferred:
+            print("Delivery queue full, the remaining due reminders are kept for the next scan")
         if changed:
             with open("reminders.json", "w", encoding="utf-8") as f:
                 json.dump(reminders, f, ensure_ascii=False, indent=4)
+        last_scan = scan_started
         now = datetime.now()
         seconds_to_next_minute = 60 - now.second
         time.sleep(max(0.01, seconds_to_next_minute))
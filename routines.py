@@ -3,16 +3,66 @@ import os
 import re
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.executors.pool import ThreadPoolExecutor
+from sqlalchemy import create_engine, event
 from weather import get_weather
 import random
 import spacy
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 import packing
+from delivery import executor as delivery_executor
 
 USER_INFORMATION_FILE = "user_information.json"
+# Routine jobs are persisted, so they survive restarts (see rehydrate_routines)
+ROUTINE_JOBSTORE_URL = "sqlite:///routine_jobs.sqlite"
+# Scheduler threads only fetch the forecast of a slot, the messages are sent by the delivery executor
+ROUTINE_SCHEDULER_WORKERS = 4
+# A slot that fires late (busy scheduler, short downtime) is still run within this many seconds
+ROUTINE_MISFIRE_GRACE_SECONDS = 300
 
-scheduler = BackgroundScheduler()
-scheduler.start()
+
+def create_jobstore_engine(url):
+    """
+        Creates the SQLAlchemy engine for the routine job store.
+        For SQLite, WAL journaling with relaxed syncing keeps per-job commits cheap,
+        which matters when thousands of routines are registered at startup.
+
+        Args:
+            url (str): SQLAlchemy database URL.
+
+        Returns:
+            Engine: The configured engine.
+    """
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+    return engine
+
+
+scheduler = BackgroundScheduler(
+    jobstores={
+        "default": SQLAlchemyJobStore(engine=create_jobstore_engine(ROUTINE_JOBSTORE_URL))
+    },
+    executors={
+        "default": ThreadPoolExecutor(ROUTINE_SCHEDULER_WORKERS)
+    },
+    job_defaults={
+        # Several missed runs of the same slot are merged into one, and a slot never runs twice in parallel
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": ROUTINE_MISFIRE_GRACE_SECONDS
+    }
+)
+
+# Jobs in the persistent store can only hold picklable arguments, so the bot instance
+# is registered once by start_scheduler and looked up when a job runs.
+_bot = None
 
 nlp_de = spacy.load("de_core_news_sm")
 nlp_en = spacy.load("en_core_web_sm")
@@ -123,13 +173,14 @@ def convert_to_24h_format(time_input):
         return None, None
 
 
-def extract_routine_details(text, language):
+def extract_routine_details(text, language, doc=None):
     """
     Extracts the city and time (hour and minute) from user input text to define a routine.
 
     Args:
         text (str): User input containing routine creation request.
         language (str): Language code ('de' or 'en') for proper NLP parsing.
+        doc: The spaCy doc of the text if it is already parsed.
 
     Returns:
         tuple: (city, hour, minute) or (None, None, None) if extraction fails.
@@ -141,7 +192,8 @@ def extract_routine_details(text, language):
 
     # Original-Text an spaCy geben (keine Kleinschreibung!)
     text_cleaned = text.strip()
-    doc = nlp(text_cleaned)
+    if doc is None:
+        doc = nlp(text_cleaned)
 
     city = None
 
@@ -189,9 +241,95 @@ def extract_routine_details(text, language):
     return None, None, None
 
 
+def normalize_city(city):
+    """
+        Normalizes a city name for grouping routines into slots ("  Berlin " and "berlin" share a slot).
+
+        Args:
+            city (str): City as entered by the user.
+
+        Returns:
+            str: Normalized city key.
+    """
+    return " ".join(city.split()).casefold()
+
+def slot_key(routine):
+    """
+        Returns the (normalized city, hour, minute) slot of a routine.
+    """
+    return normalize_city(routine["city"]), routine["hour"], routine["minute"]
+
+def slot_job_id(key):
+    """
+        Builds the scheduler job id of a routine slot.
+
+        Args:
+            key (tuple): (normalized city, hour, minute).
+
+        Returns:
+            str: The job id.
+    """
+    city_key, hour, minute = key
+    return f"routine_slot_{city_key}_{hour:02d}_{minute:02d}"
+
+# Members of every routine slot: {(city_key, hour, minute): {chat_id: [routine, ...]}}.
+# There is one scheduler job per slot, the member dicts make joining and leaving a slot O(1).
+# A user can have several routines in one slot (e.g. twice the same city and time), each one is a membership.
+routine_slots = {}
+
+def _schedule_slot(key):
+    city_key, hour, minute = key
+    scheduler.add_job(
+        run_routine_slot,
+        'cron',
+        hour=hour,
+        minute=minute,
+        args=[city_key, hour, minute],
+        id=slot_job_id(key),
+        replace_existing=True
+    )
+
+def add_routine_member(chat_id, routine):
+    """
+        Adds a user's routine to its slot. Only the first member of a slot creates the scheduler job.
+
+        Args:
+            chat_id (int or str): Telegram chat ID of the user.
+            routine (dict): Routine with 'city', 'hour', 'minute' and 'language'.
+    """
+    key = slot_key(routine)
+    members = routine_slots.setdefault(key, {})
+    if not members:
+        _schedule_slot(key)
+    members.setdefault(int(chat_id), []).append(routine)
+
+def remove_routine_member(chat_id, routine):
+    """
+        Removes a user's routine from its slot. The user only leaves the slot with their last routine in it,
+        the slot job is removed together with the last member.
+
+        Args:
+            chat_id (int or str): Telegram chat ID of the user.
+            routine (dict): The routine that was deleted.
+    """
+    key = slot_key(routine)
+    members = routine_slots.get(key)
+    if members is None:
+        return
+    memberships = members.get(int(chat_id), [])
+    if routine in memberships:
+        memberships.remove(routine)
+    if not memberships:
+        members.pop(int(chat_id), None)
+    if not members:
+        del routine_slots[key]
+        if scheduler.get_job(slot_job_id(key)):
+            scheduler.remove_job(slot_job_id(key))
+
 def schedule_daily_message(bot, chat_id, city, hour, minute, language):
     """
         Schedules a daily message at a specified time using APScheduler.
+        The user joins the (city, time) slot, which shares one job with all other users of that slot.
 
         Args:
             bot: Telegram bot instance.
@@ -201,22 +339,109 @@ def schedule_daily_message(bot, chat_id, city, hour, minute, language):
             minute (int): Minute of the scheduled message.
             language (str): Language for the message content.
     """
-    job_id = f"routine_{chat_id}_{city}_{hour:02d}_{minute:02d}"
-    if scheduler.get_job(job_id):
+    global _bot
+    if _bot is None:
+        _bot = bot
+    add_routine_member(chat_id, {"city": city, "hour": hour, "minute": minute, "language": language})
+
+def unschedule_routine(chat_id, routine):
+    """
+        Removes a deleted routine from the scheduler.
+
+        Args:
+            chat_id (int or str): Telegram chat ID of the user.
+            routine (dict): The routine that was deleted.
+    """
+    remove_routine_member(chat_id, routine)
+
+def rehydrate_routines():
+    """
+        Rebuilds the routine slots from user_info and reconciles the persistent job store after a restart.
+        Reads all stored jobs once, removes jobs of slots that no longer exist (including jobs of
+        older per-user routines) and only registers slots whose job is missing or outdated,
+        so a restart with thousands of unchanged routines does no duplicate work.
+
+        Returns:
+            tuple: (added, removed) number of jobs.
+    """
+    routine_slots.clear()
+    for chat_id, routines in user_info.items():
+        for routine in routines:
+            routine_slots.setdefault(slot_key(routine), {}).setdefault(int(chat_id), []).append(routine)
+
+    desired = {slot_job_id(key): key for key in routine_slots}
+    existing = {job.id: job for job in scheduler.get_jobs() if job.id.startswith("routine_")}
+
+    removed = 0
+    for job_id in existing.keys() - desired.keys():
         scheduler.remove_job(job_id)
+        removed += 1
 
-    scheduler.add_job(
-        send_daily_routine,
-        'cron',
-        hour=hour,
-        minute=minute,
-        args=[bot, chat_id, city, language, hour, minute],
-        id=job_id
-    )
+    added = 0
+    for job_id, key in desired.items():
+        job = existing.get(job_id)
+        if job is not None and tuple(job.args) == key:
+            continue
+        _schedule_slot(key)
+        added += 1
+
+    members = sum(len(r) for m in routine_slots.values() for r in m.values())
+    print(f"Routinen wiederhergestellt: {len(desired)} Slots für {members} Routinen, {added} Jobs registriert, {removed} entfernt.")
+    return added, removed
+
+def start_scheduler(bot):
+    """
+        Registers the bot for routine jobs, starts the scheduler and rehydrates the
+        routines from user_information.json. The scheduler starts paused, so no job
+        fires while the job store is still being reconciled.
+
+        Args:
+            bot: Telegram bot instance.
+    """
+    global _bot
+    _bot = bot
+    delivery_executor.start()
+    if not scheduler.running:
+        scheduler.start(paused=True)
+    rehydrate_routines()
+    scheduler.resume()
+
+def run_routine_slot(city_key, hour, minute):
+    """
+        Entry point of the persisted slot jobs. Fetches the weather once per language
+        for all members of the slot, builds the outfit suggestions of all members in one bulk pass
+        and hands each member's message to the delivery executor. If the delivery queue is full, this job blocks.
+
+        Args:
+            city_key (str): Normalized city of the slot.
+            hour (int): Scheduled hour.
+            minute (int): Scheduled minute.
+    """
+    members = routine_slots.get((city_key, hour, minute))
+    if not members:
+        return
+
+    by_language = {}
+    for chat_id, memberships in list(members.items()):
+        for routine in list(memberships):
+            by_language.setdefault(routine["language"], []).append((chat_id, routine))
+
+    for language, group in by_language.items():
+        weather = get_weather(group[0][1]["city"], language, forecast_day=0)
+        print(weather)
+        clothing_tips = {}
+        if weather is not None:
+            dt = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+            clothing_tips = packing.get_outfit_suggestions_bulk(
+                list(dict.fromkeys(chat_id for chat_id, _ in group)), weather['location'], dt, language,
+                forecast=packing.parse_weather_result(weather))
+        for chat_id, routine in group:
+            delivery_executor.submit(deliver_daily_routine, _bot, chat_id, weather, language, hour, minute,
+                                     clothing_tip=clothing_tips.get(chat_id))
 
 def send_daily_routine(bot, chat_id, city, language, hour, minute):
     """
-        Sends the daily weather routine message to the user, including weather info,
+        Sends the daily weather routine message to a single user, including weather info,
         clothing tip, and mood message, adjusted for time of day.
 
         Args:
@@ -229,6 +454,21 @@ def send_daily_routine(bot, chat_id, city, language, hour, minute):
     """
     weather = get_weather(city, language, forecast_day=0)
     print(weather)
+    deliver_daily_routine(bot, chat_id, weather, language, hour, minute)
+
+def deliver_daily_routine(bot, chat_id, weather, language, hour, minute, clothing_tip=None):
+    """
+        Builds and sends the daily routine message from an already fetched forecast.
+
+        Args:
+            bot: Telegram bot instance.
+            chat_id (int): User's Telegram chat ID.
+            weather (dict or None): Result of get_weather for the routine's city (forecast_day=0).
+            language (str): 'de' or 'en' for message content.
+            hour (int): Scheduled hour.
+            minute (int): Scheduled minute.
+            clothing_tip (str): Optional, outfit suggestion already built for this user (see run_routine_slot).
+    """
     if weather is None:
         bot.send_message(chat_id,
                          "Leider konnte das Wetter nicht abgerufen werden. Bitte versuche es später noch einmal."
@@ -237,8 +477,10 @@ def send_daily_routine(bot, chat_id, city, language, hour, minute):
                          )
         return
 
-    dt = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
-    clothing_tip = packing.get_outfit_suggestion(chat_id, weather['location'], dt, language)
+    if clothing_tip is None:
+        dt = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+        forecast = packing.parse_weather_result(weather)
+        clothing_tip = packing.get_outfit_suggestion(chat_id, weather['location'], dt, language, forecast=forecast)
 
     mood = random.choice(MOOD_MESSAGES.get(language, MOOD_MESSAGES["en"]))
     time_of_day = get_time_of_day(hour)
@@ -270,7 +512,7 @@ def send_daily_routine(bot, chat_id, city, language, hour, minute):
 
     bot.send_message(chat_id, msg)
 
-def handle_routine(bot, message, text, language):
+def handle_routine(bot, message, text, language, doc=None):
     """
         Handles all routine-related commands and messages:
         - Show all routines
@@ -282,6 +524,7 @@ def handle_routine(bot, message, text, language):
             message: The original Telegram message object.
             text (str): User message.
             language (str): 'de' or 'en'.
+            doc: The spaCy doc of the text if it is already parsed.
 
         Returns:
             str or None: Optional message to be sent back to the user.
@@ -330,16 +573,14 @@ def handle_routine(bot, message, text, language):
             routine = routines.pop(index)
             save_user_information(user_info)
 
-            job_id = f"routine_{chat_id}_{routine['city']}_{routine['hour']:02d}_{routine['minute']:02d}"
-            if scheduler.get_job(job_id):
-                scheduler.remove_job(job_id)
+            unschedule_routine(chat_id, routine)
 
             return f"Routine {index+1} gelöscht." if language == "de" else f"Routine {index+1} deleted."
         else:
             return "Ungültige Routinenummer." if language == "de" else "Invalid routine number."
 
     # Standard: Routine erstellen (bestehender Code)
-    city, hour, minute = extract_routine_details(text, language)
+    city, hour, minute = extract_routine_details(text, language, doc)
 
     responses = {
         "de": {
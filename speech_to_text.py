@@ -1,12 +1,11 @@
+import asyncio
 import os
+import tempfile
 import speech_recognition as sr
 from pydub import AudioSegment # Requires ffmpeg to be installed https://ffmpeg.org/download.html
 from langdetect import detect, detect_langs
 from langdetect.lang_detect_exception import LangDetectException
 
-ogg_path = "temp.ogg"
-wav_path = "temp.wav"
-
 """
 Helper function to rerun the helperfunction for language detection.
 """
@@ -138,22 +137,50 @@ def transcribe_voice(bot, message, languages=["de-DE", "en-US"]):  # Corrected l
     # Download the actual audio file from Telegram's servers
     downloaded_file = bot.download_file(file_info.file_path)
 
-    # Save the downloaded file as an OGG file (Telegram uses this format)
-    with open(ogg_path, "wb") as temp_file:
-        temp_file.write(downloaded_file)
-    
-    # Convert the OGG file to WAV format (needed for speech recognition)
-    audio = AudioSegment.from_ogg(ogg_path)
-    audio.export(wav_path, format="wav")
-    
-    # Initialize the recognizer
-    speech_recognizer = sr.Recognizer()
-    with sr.AudioFile(wav_path) as source:
-        audio_data = speech_recognizer.record(source)
+    return transcribe_audio(downloaded_file, languages)
+
+"""
+Async version of transcribe_voice for the asyncio runtime (see async_bot.py).
+The download runs on the event loop, the conversion and the recognition (blocking) in the executor.
+
+----
+Args:
+    bot: The AsyncTeleBot instance.
+    message: The voice message.
+    executor: The executor for the blocking part (None uses the loop's default executor).
+"""
+async def transcribe_voice_async(bot, message, executor=None, languages=["de-DE", "en-US"]):
+    file_info = await bot.get_file(message.voice.file_id)
+    downloaded_file = await bot.download_file(file_info.file_path)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, transcribe_audio, downloaded_file, languages)
+
+"""
+Transcribe a downloaded voice message (OGG bytes) and detect its language.
+Returns (text, language) or (None, None) if nothing was recognized.
+"""
+def transcribe_audio(downloaded_file, languages=["de-DE", "en-US"]):
+    # Unique temporary files, several voice messages may be transcribed at the same time
+    fd, ogg_path = tempfile.mkstemp(suffix=".ogg")
+    wav_path = ogg_path[:-len(".ogg")] + ".wav"
+    try:
+        # Save the downloaded file as an OGG file (Telegram uses this format)
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(downloaded_file)
+
+        # Convert the OGG file to WAV format (needed for speech recognition)
+        audio = AudioSegment.from_ogg(ogg_path)
+        audio.export(wav_path, format="wav")
 
-    # Clean up temporary files
-    os.remove(ogg_path)
-    os.remove(wav_path)
+        # Initialize the recognizer
+        speech_recognizer = sr.Recognizer()
+        with sr.AudioFile(wav_path) as source:
+            audio_data = speech_recognizer.record(source)
+    finally:
+        # Clean up temporary files
+        for path in (ogg_path, wav_path):
+            if os.path.exists(path):
+                os.remove(path)
 
     results = {}
     for lang in languages:
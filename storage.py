@@ -0,0 +1,43 @@
+import json
+import os
+import signal
+import tempfile
+
+"""
+Write JSON data to a file atomically.
+The data is written to a temporary file in the same directory and then renamed over the target,
+so readers (and a crash in the middle of a write) never see a half-written file.
+
+----
+
+Args:
+    path (str): The target file.
+    data: The JSON-serializable data, or an already serialized string.
+    indent (int): Optional indentation, None writes compact JSON.
+"""
+def atomic_write_json(path, data, indent=None):
+    content = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, indent=indent)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(128 + signum)
+
+"""
+Make SIGTERM stop the process through SystemExit instead of the default handler.
+The default handler ends the process without running atexit, so the write-behind stores
+(wardrobes, suggestion contexts) would lose their unflushed changes.
+Must be called from the main thread.
+"""
+def exit_on_sigterm():
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
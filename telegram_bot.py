@@ -1,8 +1,10 @@
 # Modules to import
-import re
+import io
+import sys
 
 import telebot
 import os
+from datetime import datetime
 
 # Custom modules to import
 from wnw_bot_api_token import token as api_token
@@ -13,19 +15,30 @@ import reminder
 import weather
 import requests
 import matplotlib
-from PIL import Image, ImageDraw, ImageFont
 
+import forecast_chart
 import speech_to_text
 import intent_detection
 import text_to_speech
 import help_loader
+from dispatcher import OrderedTeleBot
+from intents import IntentRegistry
+from outbound import OutboundMixin
+from storage import exit_on_sigterm
+import webhook
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 # For asynchronous operations
 import threading
 
+class WnwBot(OutboundMixin, OrderedTeleBot):
+    """
+    Updates are processed by a per-chat ordered worker pool (see dispatcher.py),
+    everything sent goes through the rate-limited outbound queue (see outbound.py).
+    """
+
 # Initialize the bot with the API token
-bot = telebot.TeleBot(api_token, parse_mode=None)  # You can set parse_mode by default. HTML or MARKDOWN
+bot = WnwBot(api_token, parse_mode=None)  # You can set parse_mode by default. HTML or MARKDOWN
 
 ## Define a function to send a welcome message
 def send_welcome(message):
@@ -229,12 +242,28 @@ def handle_tts_callback(call):
     # Hole die letzte Bot-Nachricht im Chat (optional: oder speichere Text im Callback)
     # Hier nehmen wir an, dass der Callback auf die letzte Bot-Nachricht folgt
     reply_text = call.message.text
-    ogg_path = text_to_speech.text_to_speech(reply_text, lang=lang)
-    with open(ogg_path, "rb") as audio:
-        bot.send_voice(call.message.chat.id, audio)
-    os.remove(ogg_path)
+    send_tts_voice(call.message.chat.id, reply_text, lang)
     bot.answer_callback_query(call.id)
 
+def send_tts_voice(chat_id, text, lang):
+    """
+        Sends the text as voice message: by the file_id of an earlier upload of the same text if there is one,
+        else the cached or newly synthesized OGG, whose file_id is kept for the next time (see text_to_speech.TTSCache).
+    """
+    key = text_to_speech.tts_key(text, lang)
+    cache = text_to_speech.get_tts_cache()
+    file_id = cache.get_file_id(key)
+    if file_id:
+        try:
+            bot.send_voice(chat_id, file_id)
+            return
+        except telebot.apihelper.ApiTelegramException as e:
+            print(f"Cached voice rejected, uploading again: {e}")
+            cache.set_file_id(key, None)
+    sent = bot.send_voice(chat_id, io.BytesIO(text_to_speech.speech_ogg(text, lang)))
+    if sent is not None and sent.voice:
+        cache.set_file_id(key, sent.voice.file_id)
+
 def get_location_from_coordinates(latitude, longitude):
     """
         Function to get location from coordinates
@@ -305,32 +334,34 @@ def handle_help_callback(call):
     bot.answer_callback_query(call.id)
 
 
-def get_weather_icon_path(description):
+def fetch_chart_forecast(location, lang):
     """
-        Gibt den Pfad zum passenden Wettersymbol zurück
+        Fetches today, tomorrow and the day after tomorrow for the forecast chart.
     """
-    description = description.lower()
-    if "sunny" in description or "clear" in description or "sonnig" in description:
-        return "assets/icons/sun.png"
-    elif "cloudy" in description or "bewölkt" in description:
-        return "assets/icons/cloud.png"
-    elif "rain" in description or "regenfall" in description:
-        return "assets/icons/rain.png"
-    elif "snow" in description or "schneefall" in description:
-        return "assets/icons/snow.png"
-    elif "fog" in description or "nebel" in description:
-        return "assets/icons/fog.png"
-    elif "drizzle" in description or "nieselregen" in description:
-        return "assets/icons/drizzle.png"
-    elif "ice pellets" in description or "hagel" in description:
-        return "assets/icons/hail.png"
-    elif "sleet shower" in description or "graupelschauer" in description:
-        return "assets/icons/sleet.png"
-    elif "thunder" in description or "gewitter" in description:
-        return "assets/icons/thunder.png"
-    else:
-        return "assets/icons/unknown.png"
+    return [forecast_chart.parse_forecast_day(weather.get_weather(location, lang, day), label, lang)
+            for day, label in enumerate(forecast_chart.DAY_LABELS[lang])]
+
+def send_forecast_chart(chat_id, location, forecast_data, lang):
+    """
+        Sends the forecast chart, from the chart cache if possible: by the file_id of an earlier upload
+        (no rendering, no upload), else the cached or newly rendered PNG, whose file_id is kept for the next time.
+    """
+    key = forecast_chart.chart_key(location, lang, datetime.now().date(), forecast_data)
+    caption = forecast_chart.chart_caption(location, lang)
+    cached = forecast_chart.chart_cache.get(key)
+    if cached is not None and cached.file_id:
+        try:
+            bot.send_photo(chat_id, cached.file_id, caption=caption)
+            return
+        except telebot.apihelper.ApiTelegramException as e:
+            print(f"Cached chart rejected, uploading again: {e}")
+            forecast_chart.chart_cache.forget_file_id(key)
 
+    png = cached.png if cached is not None else forecast_chart.render_pool.render(location, forecast_data, lang)
+    sent = bot.send_photo(chat_id, io.BytesIO(png), caption=caption)
+    # The largest size is the uploaded image itself
+    file_id = sent.photo[-1].file_id if sent is not None and sent.photo else None
+    forecast_chart.chart_cache.put(key, png, file_id)
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("weather_chart|"))
 def handle_weather_chart_callback(call):
@@ -339,17 +370,9 @@ def handle_weather_chart_callback(call):
 
         This function:
         - Fetches weather data for the next 3 days from the API
-        - Extracts average temperature and weather description
-        - Selects the appropriate weather icons
-        - Draws the weather data onto a predefined image template (forecast card)
-        - Sends the generated forecast image back to the Telegram chat
-
-        Steps:
-        1. Reads the location from callback data
-        2. Retrieves weather forecast data for 3 days
-        3. Draws temperatures, descriptions, and icons on the image template
-        4. Sends the completed image as a photo message
-        5. Deletes the temporary image file afterwards
+        - Renders the forecast card in memory with the preloaded assets (see forecast_chart.py)
+        - Sends the generated forecast image back to the Telegram chat, or the cached one
+          if the same chart was already sent today
 
         Args:
             call: The callback query object from the Telegram bot (contains chat/user info)
@@ -359,89 +382,8 @@ def handle_weather_chart_callback(call):
         user_lang = call.from_user.language_code
         lang = "de" if user_lang.startswith("de") else "en"
 
-        if lang == "de":
-            background_path = "assets/Forecast_de.png"
-            days = ["Heute", "Morgen", "Übermorgen"]
-            temp_marker = "Ø"
-            regex_marker = "Ø"
-        else:
-            background_path = "assets/Forecast_en.png"
-            days = ["Today", "Tomorrow", "Day After Tomorrow"]
-            temp_marker = "avg"
-            regex_marker = "avg"
-
-        forecast_data = []
-        for day in range(3):
-            data = weather.get_weather(location, lang, day)
-            print(data)
-            if data and "text" in data:
-                if temp_marker in data['text']:
-                    try:
-                        parts = data['text'].split(temp_marker)[1].split("°C")[0].strip()
-                        avg_temp = float(parts)
-                    except:
-                        avg_temp = 0.0
-                else:
-                    avg_temp = 0.0
-
-                pattern = r":\s*(.*?)\,\s*" + re.escape(regex_marker)
-                match = re.search(pattern, data['text'])
-                if match:
-                    desc = match.group(1)
-                else:
-                    desc = "No data" if lang == "en" else "Keine Daten"
-
-                forecast_data.append({
-                    "day": days[day],
-                    "temp": avg_temp,
-                    "desc": desc
-                })
-            else:
-                forecast_data.append({
-                    "day": days[day],
-                    "temp": 0,
-                    "desc": "No data" if lang == "en" else "Keine Daten"
-                })
-
-        # Load the forecast image template
-        base_image = Image.open(background_path).convert("RGBA")
-        draw = ImageDraw.Draw(base_image)
-
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        font_path_regular = os.path.join(base_dir, "assets", "fonts", "Roboto-Regular.ttf")
-        font_path_bold = os.path.join(base_dir, "assets", "fonts", "Roboto-Bold.ttf")
-
-        # Load fonts with desired sizes
-        font_large = ImageFont.truetype(font_path_bold, 40)
-        font_small = ImageFont.truetype(font_path_regular, 25)
-
-        # Draw weather data onto the template
-        card_width = base_image.width // 3
-        draw.text((card_width + 70, 50), f"{location}", font=font_large, fill="black")
-        for i, forecast in enumerate(forecast_data):
-            x_offset = [80, 45, 15]
-            icon_offset = [45, 40, 45]
-            x = i * card_width + x_offset[i]
-            y = 800
-
-            icon_path = get_weather_icon_path(forecast["desc"])
-            print("ICON PATH:", icon_path)
-            if os.path.exists(icon_path):
-                icon = Image.open(icon_path).convert("RGBA").resize((340, 340))
-                base_image.paste(icon, (x - icon_offset[i], 340), icon)
-
-            draw.text((x, y), f"{forecast['temp']}°C", font=font_large, fill="black")
-            draw.text((x, y + 60), forecast["desc"], font=font_small, fill="black")
-
-        # Save and send the image
-        image_path = f"{location}_forecast.png"
-        base_image.save(image_path)
-
-        caption = f"📊 Weather Forecast for {location}" if lang == "en" else f"📊 Wetterkarte für {location}"
-        with open(image_path, "rb") as photo:
-            bot.send_photo(call.message.chat.id, photo, caption=caption)
-
-        os.remove(image_path)
+        forecast_data = fetch_chart_forecast(location, lang)
+        send_forecast_chart(call.message.chat.id, location, forecast_data, lang)
         bot.answer_callback_query(call.id)
 
     except Exception as e:
@@ -460,9 +402,7 @@ def handle_delete_routine_callback(call):
             routines.save_user_information(routines.user_info)
 
             # Scheduler-Job entfernen
-            job_id = f"routine_{chat_id}_{routine['city']}_{routine['hour']:02d}_{routine['minute']:02d}"
-            if routines.scheduler.get_job(job_id):
-                routines.scheduler.remove_job(job_id)
+            routines.unschedule_routine(chat_id, routine)
 
             # Ausgabe
             city = routine["city"]
@@ -492,6 +432,73 @@ def handle_routines(message):
     if response:
         bot.send_message(message.chat.id, response)
 
+# Handlers of the detected intents with the needs they are called with (see intents.py),
+# each returns the reply text (or None if it already answered)
+intents = IntentRegistry()
+
+@intents.provider("doc")
+def parse_text(request):
+    # One spaCy parse per message, shared by all needs and handlers using it
+    nlp = packing.nlp_de if request.language.startswith("de") else packing.nlp_en
+    return nlp(request.text)
+
+@intents.provider("location")
+def named_location(request):
+    return weather.extract_location(request.text, request.language, doc=request.need("doc"))
+
+@intents.provider("time")
+def sent_at(request):
+    # Relative dates and times refer to when the user sent the message, not when its queue got to it
+    return datetime.fromtimestamp(request.message.date)
+
+@intents.intent("packing", needs=("language", "doc", "time"))
+def answer_packing(message, text, language, doc, time):
+    return packing.handle_packing(bot, message, text, language, doc=doc, now=time)
+
+@intents.intent("preference")
+def answer_preference(message, text, language):
+    return packing.handle_preference_feedback(message.chat.id, text, language)
+
+@intents.intent("routine", needs=("language", "doc"))
+def answer_routine(message, text, language, doc):
+    return routines.handle_routine(bot, message, text, language, doc=doc)
+
+@intents.intent("routine_list")
+def answer_routine_list(message, text, language):
+    return routines.handle_routine(bot, message, "/routines", language)
+
+@intents.intent("routine_delete")
+def answer_routine_delete(message, text, language):
+    return routines.handle_routine(bot, message, "/delete_routine", language)
+
+@intents.intent("wardrobe")
+def answer_wardrobe(message, text, language):
+    return wardrobe.handle_wardrobe(bot, message, text, language)
+
+@intents.intent("reminder", needs=("language", "time"))
+def answer_reminder(message, text, language, time):
+    return reminder.handle_reminder(bot, message, text, language, now=time)
+
+@intents.intent("help", needs=())
+def answer_help(message, text):
+    # Trigger help command
+    return handle_help(message)
+
+@intents.intent("weather", needs=("language", "location"))
+def answer_weather(message, text, language, location):
+    return weather.weather_reply(text, language, location)
+
+def answer_intent(message, text, language, intent, not_understood):
+    """
+    Runs the handler of an intent from the registry and sends its reply (with the TTS button).
+    Sends not_understood if there is no handler for the intent.
+    """
+    handled, response = intents.handle(intent, message, text, language)
+    if not handled:
+        response = not_understood
+    if response:
+        send_reply_with_tts_button(message, response, language)
+
 # Function to interpret the user's intent if it is not a command
 @bot.message_handler(content_types=['text'])
 def handle_text(message):
@@ -502,34 +509,18 @@ def handle_text(message):
         return
     intent = intent_detection.detect_intent(text, language)
     print("Intent: " + str(intent))
-    response = None
-    if intent == "packing":
-        response = packing.handle_packing(bot, message, text, language)
-    elif intent == "preference":
-        response = packing.handle_preference_feedback(message.chat.id, text, language)
-    elif intent == "routine":
-        response = routines.handle_routine(bot, message, text, language)
-    elif intent == "routine_list":
-        response = routines.handle_routine(bot, message, "/routines", language)
-    elif intent == "routine_delete":
-        response = routines.handle_routine(bot, message, "/delete_routine", language)
-    elif intent == "wardrobe":
-        response = wardrobe.handle_wardrobe(bot, message, text, language)
-    elif intent == "reminder":
-        response = reminder.handle_reminder(bot, message, text, language)
-    elif intent == "help":
-        # Trigger help command
-        handle_help(message)
-        return
-    elif intent == "weather":
-        response = weather.handle_weather(bot, message, text, language)
-    else:
+    answer_intent(message, text, language, intent, not_understood_text(language))
+
+def not_understood_text(language, text=None):
+    if text is None:
         if language == "de":
-            response = "Es tut mir leid, ich habe dich nicht verstanden. Bitte versuche es erneut."
+            return "Es tut mir leid, ich habe dich nicht verstanden. Bitte versuche es erneut."
         elif language == "en":
-            response = "Sorry, I didn't understand. Please try again."
-    if response:
-        send_reply_with_tts_button(message, response, language)
+            return "Sorry, I didn't understand. Please try again."
+        return None
+    if language == "de":
+        return f"Es tut mir leid, ich habe dich nicht verstanden. Ich habe nur verstanden: {text}."
+    return f"Sorry, I didn't understand your intent, I understood {text}."
 
 # Function to handle voice messages
 @bot.message_handler(content_types=['voice'])
@@ -537,51 +528,65 @@ def handle_voice(message):
     text, language = speech_to_text.transcribe_voice(bot, message)
     
     if text:
-        print(f"Input: {text}, Language: {language}")
-        intent = intent_detection.detect_intent(text, language)
-        response = None
-        if intent == "packing":
-            response = packing.handle_packing(bot, message, text, language)
-        elif intent == "preference":
-            response = packing.handle_preference_feedback(message.chat.id, text, language)
-        elif intent == "routine":
-            response = routines.handle_routine(bot, message, text, language)
-        elif intent == "routine_list":
-            response = routines.handle_routine(bot, message, "/routines", language)
-        elif intent == "routine_delete":
-            response = routines.handle_routine(bot, message, "/delete_routine", language)
-        elif intent == "wardrobe":
-            response = wardrobe.handle_wardrobe(bot, message, text, language)
-        elif intent == "reminder":
-            response = reminder.handle_reminder(bot, message, text, language)
-        elif intent == "help":
-            # Trigger help command
-            handle_help(message)
-            return
-        elif intent == "weather":
-            response = weather.handle_weather(bot, message, text, language)
-        else:
-            if language == "de":
-                response = f"Es tut mir leid, ich habe dich nicht verstanden. Ich habe nur verstanden: {text}."
-            else:
-                response = f"Sorry, I didn't understand your intent, I understood {text}."
-        if response:
-            send_reply_with_tts_button(message, response, language)
+        answer_transcription(message, text, language)
     else:
         bot.reply_to(message, "Sorry, I couldn't understand your voice message.")
 
+def answer_transcription(message, text, language):
+    """
+    Answers the transcribed text of a voice message.
+    """
+    print(f"Input: {text}, Language: {language}")
+    intent = intent_detection.detect_intent(text, language)
+    answer_intent(message, text, language, intent, not_understood_text(language, text))
+
 
-# Set the bot commands    
-bot.set_my_commands([
-    telebot.types.BotCommand("start", "Greetings"),
-    telebot.types.BotCommand("help", "Show bot features and examples"),
-    telebot.types.BotCommand("routines", "Show all saved routines"),
-    telebot.types.BotCommand("kleiderschrank", "Bearbeiten des Kleiderschranks"),
-    telebot.types.BotCommand("wardrobe", "Manage your wardrobe")
-])
+# How updates are received: "polling" (default), "webhook" (see webhook.py) or "async" (see async_bot.py)
+BOT_MODE = os.environ.get("WNW_BOT_MODE", "polling")
 
-# Start the check_reminders thread
-threading.Thread(target=reminder.check_reminders, args=(bot,), daemon=True).start()
+def start_background_services(bot):
+    """
+    Starts the routine scheduler (restoring the saved routines) and the reminder thread.
+    """
+    routines.start_scheduler(bot)
+    threading.Thread(target=reminder.check_reminders, args=(bot,), daemon=True).start()
+
+def start_webhook_services():
+    forecast_chart.render_pool.start()
+    start_background_services(bot)
+
+def register_commands():
+    # Set the bot commands
+    bot.set_my_commands([
+        telebot.types.BotCommand("start", "Greetings"),
+        telebot.types.BotCommand("help", "Show bot features and examples"),
+        telebot.types.BotCommand("routines", "Show all saved routines"),
+        telebot.types.BotCommand("kleiderschrank", "Bearbeiten des Kleiderschranks"),
+        telebot.types.BotCommand("wardrobe", "Manage your wardrobe")
+    ])
+
+def main():
+    # Flush the write-behind stores when the process is stopped (e.g. by systemd or docker stop)
+    exit_on_sigterm()
+    if BOT_MODE == "async":
+        # Asyncio runtime (see async_bot.py), it reuses the handlers of this module.
+        # Started as a script this module is __main__, register it under its name so
+        # async_bot gets this instance instead of importing a second copy
+        sys.modules.setdefault("telegram_bot", sys.modules[__name__])
+        import async_bot
+        async_bot.main()
+        return
 
-# Start the bot
-bot.infinity_polling()
\ No newline at end of file
+    register_commands()
+    if BOT_MODE == "webhook":
+        webhook.run(bot, on_start=start_webhook_services)
+    else:
+        # Fork the chart renderers before any thread of the bot runs
+        forecast_chart.render_pool.start()
+        start_background_services(bot)
+        # Start the bot
+        bot.remove_webhook()
+        bot.infinity_polling()
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,295 @@
 from gtts import gTTS
+import asyncio
+import atexit
+import hashlib
+import io
+import json
 import os
+import subprocess
 import tempfile
+import threading
+import time
+from collections import OrderedDict
 
-def text_to_speech(text, lang='de'):
+from storage import atomic_write_json
+
+# ffmpeg arguments converting the gTTS MP3 to OGG/Opus (Telegram prefers OGG/Opus for voice messages)
+FFMPEG_OPUS_ARGS = ["-acodec", "libopus"]
+# ffmpeg reading the MP3 from stdin and writing the OGG to stdout
+FFMPEG_PIPE_COMMAND = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "mp3", "-i", "pipe:0",
+                       *FFMPEG_OPUS_ARGS, "-f", "ogg", "pipe:1"]
+# ffmpeg processes started ahead of time, so a readout does not wait for the process start (0 disables)
+FFMPEG_PRESPAWN = 2
+# Seconds a conversion may take
+FFMPEG_TIMEOUT = 30
+
+# Cache of synthesized voice messages: one OGG file per (text, language), least recently used removed first
+TTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+TTS_CACHE_MAX_BYTES = 50 * 1024 * 1024
+# Telegram file_ids of uploaded voice messages, kept even after the OGG is evicted (sending needs only the id)
+TTS_FILE_IDS_FILE = os.path.join(TTS_CACHE_DIR, "file_ids.json")
+TTS_FILE_IDS_LIMIT = 20000
+# Seconds between writes of changed file_ids (batched in the background like the wardrobe store)
+TTS_FILE_IDS_FLUSH_INTERVAL = 5
+
+def synthesize_mp3(text, lang='de'):
     """
-    Converts text to speech and returns the path to the audio file (OGG for Telegram).
+    Converts text to speech with gTTS and returns the MP3 bytes.
     """
     # gTTS supports 'de' and 'en' etc.
-    tts = gTTS(text=text, lang=lang)
-    # Use a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
-        tts.save(fp.name)
-        mp3_path = fp.name
-    # Convert mp3 to ogg (Telegram prefers OGG/Opus for voice messages)
-    ogg_path = mp3_path.replace('.mp3', '.ogg')
-    os.system(f'ffmpeg -y -i "{mp3_path}" -acodec libopus "{ogg_path}"')
-    os.remove(mp3_path)
-    return ogg_path
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buffer)
+    return buffer.getvalue()
+
+class FFmpegPool:
+    """
+    Converts MP3 to OGG/Opus with ffmpeg over pipes (no files, no shell).
+    Every ffmpeg process converts one stream, so `size` processes are started ahead of time and wait
+    for their input; a conversion takes a waiting process and a replacement is started in the background.
+    """
+
+    def __init__(self, size=FFMPEG_PRESPAWN, command=FFMPEG_PIPE_COMMAND):
+        self.size = size
+        self.command = command
+        self.lock = threading.Lock()
+        self._waiting = []
+
+    def _spawn(self):
+        return subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _refill(self):
+        try:
+            while True:
+                with self.lock:
+                    if len(self._waiting) >= self.size:
+                        return
+                process = self._spawn()
+                with self.lock:
+                    self._waiting.append(process)
+        except OSError as e:
+            print(f"Could not start ffmpeg: {e}")
+
+    def _take(self):
+        with self.lock:
+            while self._waiting:
+                process = self._waiting.pop()
+                if process.poll() is None:
+                    return process
+        return self._spawn()
+
+    def transcode(self, mp3):
+        """
+        Returns the OGG/Opus bytes of the MP3 bytes.
+        """
+        process = self._take()
+        if self.size > 0:
+            threading.Thread(target=self._refill, daemon=True).start()
+        try:
+            ogg, errors = process.communicate(mp3, timeout=FFMPEG_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        if process.returncode != 0 or not ogg:
+            raise RuntimeError(f"ffmpeg failed ({process.returncode}): {errors.decode(errors='replace').strip()}")
+        return ogg
+
+# Shared ffmpeg processes of the bot process (started on the first readout)
+ffmpeg_pool = FFmpegPool()
+
+def text_to_speech(text, lang='de'):
+    """
+    Converts text to speech and returns the audio as OGG/Opus bytes (the voice format of Telegram),
+    entirely in memory.
+    """
+    return ffmpeg_pool.transcode(synthesize_mp3(text, lang))
+
+async def text_to_speech_async(text, lang='de', executor=None):
+    """
+    Async version of text_to_speech for the asyncio runtime (see async_bot.py).
+    gTTS (blocking HTTP) and the ffmpeg pipe run in the executor.
+    Returns the audio as OGG/Opus bytes.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, text_to_speech, text, lang)
+
+def tts_key(text, lang):
+    """
+    Content address of a voice message: hash of the language and the exact text.
+    """
+    return hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """
+    Content-addressed cache of voice messages on disk (OGG bytes by tts_key) with an LRU size limit,
+    plus the Telegram file_id of every uploaded voice message, so a repeated readout is a single send_voice.
+    Changed file_ids are written back in the background every flush_interval seconds.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES, file_ids_path=TTS_FILE_IDS_FILE,
+                 flush_interval=TTS_FILE_IDS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.file_ids_path = file_ids_path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._dirty = False
+        # Serializes whole flushes (snapshot and write), so the flush at exit and the background flush
+        # cannot overlap and replace a newer file with an older snapshot
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        os.makedirs(directory, exist_ok=True)
+        # key -> size, least recently used first (restored from the modification times)
+        self._sizes = OrderedDict()
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".ogg"):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+        self._total = sum(self._sizes.values())
+        self._file_ids = OrderedDict()
+        if os.path.exists(file_ids_path):
+            with open(file_ids_path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            self._file_ids.update(json.loads(content) if content else {})
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.ogg")
+
+    def get_audio(self, key):
+        """
+        Returns the cached OGG bytes, or None.
+        """
+        with self.lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            # The modification time keeps the LRU order across restarts
+            os.utime(self._path(key))
+            return data
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            with self.lock:
+                self._total -= self._sizes.pop(key, 0)
+            return None
+
+    def put_audio(self, key, data):
+        """
+        Stores OGG bytes and removes the least recently used files beyond the size limit.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_", suffix=".ogg")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        evicted = []
+        with self.lock:
+            self._total += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            while self._total > self.max_bytes and len(self._sizes) > 1:
+                old, size = self._sizes.popitem(last=False)
+                self._total -= size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
+
+    def get_file_id(self, key):
+        with self.lock:
+            file_id = self._file_ids.get(key)
+            if file_id is not None:
+                self._file_ids.move_to_end(key)
+            return file_id
+
+    def set_file_id(self, key, file_id):
+        """
+        Remembers (file_id) or forgets (None) the uploaded voice message of a key.
+        Only marks the file_ids as changed, they are written in the background.
+        """
+        with self.lock:
+            if file_id is None:
+                self._file_ids.pop(key, None)
+            else:
+                self._file_ids[key] = file_id
+                self._file_ids.move_to_end(key)
+                while len(self._file_ids) > TTS_FILE_IDS_LIMIT:
+                    self._file_ids.popitem(last=False)
+            self._dirty = True
+            self._start_flusher()
+
+    def flush(self):
+        """
+        Writes the file_ids to disk if any changed since the last flush.
+        """
+        with self._flush_lock:
+            with self.lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                content = json.dumps(self._file_ids, ensure_ascii=False)
+            try:
+                atomic_write_json(self.file_ids_path, content)
+            except Exception:
+                with self.lock:
+                    self._dirty = True
+                raise
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="tts-file-ids-flush", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[TTSCache] Flush failed: {e}")
+
+# Shared cache of the bot process, created on first use (so importing the module touches no files)
+_tts_cache = None
+_tts_cache_lock = threading.Lock()
+
+def get_tts_cache():
+    """
+    Returns the shared TTSCache, creating it (and its directory) on the first call. Flushed on shutdown.
+    """
+    global _tts_cache
+    with _tts_cache_lock:
+        if _tts_cache is None:
+            _tts_cache = TTSCache()
+            atexit.register(_tts_cache.flush)
+        return _tts_cache
+
+def speech_ogg(text, lang='de'):
+    """
+    Returns the voice message for a text as OGG bytes, from the cache or synthesized (and then cached).
+    """
+    key = tts_key(text, lang)
+    cache = get_tts_cache()
+    data = cache.get_audio(key)
+    if data is None:
+        data = text_to_speech(text, lang)
+        cache.put_audio(key, data)
+    return data
+
+async def speech_ogg_async(text, lang='de', executor=None):
+    """
+    Async version of speech_ogg for the asyncio runtime.
+    """
+    loop = asyncio.get_running_loop()
+    key = tts_key(text, lang)
+    cache = await loop.run_in_executor(executor, get_tts_cache)
+    data = await loop.run_in_executor(executor, cache.get_audio, key)
+    if data is None:
+        data = await text_to_speech_async(text, lang, executor)
+        await loop.run_in_executor(executor, cache.put_audio, key, data)
+    return data
@@ -1,7 +1,13 @@
 import os
 import json
+import atexit
+import threading
+import time
 import spacy
-from rapidfuzz import fuzz
+from spacy.matcher import PhraseMatcher
+from rapidfuzz import fuzz, process
+from storage import atomic_write_json
+from clothing import ClothingItem, ITEM_FIELDS, is_legacy_item, normalize_name, weather_mask, weather_types
 
 # Load both spaCy models for NLP (German and English supported)
 nlp_de = spacy.load("de_core_news_sm")  # python -m spacy download de_core_news_sm to install the German model
@@ -141,32 +147,304 @@ def get_default_wardrobe_en():
         ]
     }
 
-# Returns the default wardrobe for the given language ("de" or "en")
+# Returns the default wardrobe for the given language ("de" or "en") as ClothingItem lists
 def get_default_wardrobe(language="de"):
     if language.lower().startswith("en"):
-        return get_default_wardrobe_en()
+        default = get_default_wardrobe_en()
     else:
-        return get_default_wardrobe_de()
+        default = get_default_wardrobe_de()
+    return {cat: [ClothingItem.from_value(i) for i in items] for cat, items in default.items()}
 
+WARDROBE_FILE = "wardrobe.json"
+# Changed wardrobes are written back in the background at most this often (seconds)
+WARDROBE_FLUSH_INTERVAL = 5
+
+# Shared default wardrobes per language. They are never handed out or modified,
+# user wardrobes only store their differences (see diff_wardrobe) on top of them.
+_DEFAULT_WARDROBES = {
+    "de": get_default_wardrobe("de"),
+    "en": get_default_wardrobe("en")
+}
+
+def _wardrobe_language(language):
+    return "en" if language and language.lower().startswith("en") else "de"
+
+def _stored_field(name, value):
+    # Weather bitmasks are stored as lists of weather types
+    return weather_types(value) if name == "weather" else value
+
+"""
+Build the read view of a user's wardrobe from its stored delta.
+The delta has the form {"language": ..., "added": {cat: [items]}, "removed": {cat: [names]}, "overrides": {cat: {name: {field: value}}}},
+all parts except the language are optional. The returned view holds private ClothingItem copies the caller may modify.
+
+----
+
+Args:
+    delta: The stored delta of the user.
 """
-Load the wardrobe.json file or create it if it does not exist.
-Returns the wardrobe data as a dictionary.
+def merge_wardrobe(delta):
+    default = _DEFAULT_WARDROBES[_wardrobe_language(delta.get("language"))]
+    added = delta.get("added", {})
+    removed = delta.get("removed", {})
+    overrides = delta.get("overrides", {})
+    view = {}
+    for cat, items in default.items():
+        removed_names = set(removed.get(cat, []))
+        cat_overrides = overrides.get(cat, {})
+        view[cat] = [item.copy(**cat_overrides.get(item.key, {}))
+                     for item in items if item.key not in removed_names]
+    for cat, items in added.items():
+        view.setdefault(cat, []).extend(ClothingItem.from_value(i) for i in items)
+    return view
+
 """
-def load_wardrobe():
-    if not os.path.exists("wardrobe.json"):
-        with open("wardrobe.json", "w", encoding="utf-8") as f:
-            json.dump({}, f)
-    with open("wardrobe.json", "r", encoding="utf-8") as f:
-        content = f.read().strip()
+Compute the delta of a wardrobe against the default wardrobe of its language.
+Items are identified by their normalized name.
+
+----
+
+Args:
+    view: The user's full wardrobe (dict of category -> items).
+    language: The language of the default wardrobe the user started with.
+"""
+def diff_wardrobe(view, language):
+    lang = _wardrobe_language(language)
+    default = _DEFAULT_WARDROBES[lang]
+    delta = {"language": lang}
+    added, removed, overrides = {}, {}, {}
+    for cat, default_items in default.items():
+        items = {i.key: i for i in view.get(cat, [])}
+        for default_item in default_items:
+            item = items.pop(default_item.key, None)
+            if item is None:
+                removed.setdefault(cat, []).append(default_item.key)
+            else:
+                changed = {f: _stored_field(f, getattr(item, f)) for f in ITEM_FIELDS
+                           if getattr(item, f) != getattr(default_item, f)}
+                if changed:
+                    overrides.setdefault(cat, {})[default_item.key] = changed
+        if items:
+            added[cat] = [i.to_dict() for i in view.get(cat, []) if i.key in items]
+    for cat, items in view.items():
+        if cat not in default and items:
+            added[cat] = [i.to_dict() for i in items]
+    if added:
+        delta["added"] = added
+    if removed:
+        delta["removed"] = removed
+    if overrides:
+        delta["overrides"] = overrides
+    return delta
+
+"""
+Convert a wardrobe entry of the old file format ([full wardrobe]) into a delta.
+The language is derived from the category names of the stored wardrobe.
+"""
+def _migrate_legacy_entry(entry):
+    stored = entry[0] if entry else {}
+    view = {cat: [ClothingItem.from_value(i) for i in items] for cat, items in stored.items()}
+    language = "en" if set(view) & set(_DEFAULT_WARDROBES["en"]) else "de"
+    return diff_wardrobe(view, language)
+
+"""
+Normalize the added items of a delta that still use legacy forms
+(plain name strings, weather as a string instead of a list).
+Returns True if the delta was changed.
+"""
+def _migrate_legacy_items(delta):
+    changed = False
+    for cat, items in delta.get("added", {}).items():
+        if any(is_legacy_item(i) for i in items):
+            delta["added"][cat] = [ClothingItem.from_value(i).to_dict() for i in items]
+            changed = True
+    return changed
+
+class WardrobeStore:
+    """
+    Process-wide repository for all wardrobes.
+    The wardrobe file is parsed once; reads are served from memory and changes only mark the user as dirty.
+    A background thread writes the file back (atomic rename) when there are dirty users,
+    and the store is flushed on shutdown.
+
+    On disk every user only has a small delta against the shared default wardrobe of their language.
+    The full wardrobe (read view) is merged on first access and cached; writes derive the delta again.
+    """
+
+    def __init__(self, path=WARDROBE_FILE, flush_interval=WARDROBE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        # Reentrant, so code holding the lock for a read-modify-write can call the store methods
+        self.lock = threading.RLock()
+        self._data = None
+        self._views = {}
+        # Incremented on every change of a user's wardrobe, so derived data (e.g. outfit tables) can be rebuilt
+        self._versions = {}
+        # Callbacks(chat_id) run on every change of a user's wardrobe (see on_wardrobe_change)
+        self._listeners = []
+        self._dirty = set()
+        # Serializes whole flushes (snapshot and write), so a flush on shutdown and the background flush
+        # cannot overlap and replace a newer file with an older snapshot
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
         if not content:
             return {}
         try:
-            return json.loads(content)
+            data = json.loads(content)
         except json.JSONDecodeError:
             return {}
+        # One-time migration of full per-user copies to deltas and of legacy item forms
+        for chat_id, entry in data.items():
+            if isinstance(entry, list):
+                data[chat_id] = _migrate_legacy_entry(entry)
+                self._dirty.add(chat_id)
+            elif _migrate_legacy_items(entry):
+                self._dirty.add(chat_id)
+        return data
+
+    def data(self):
+        """
+        Returns the live mapping {chat_id: delta} of all users, loading the file on first access.
+        """
+        with self.lock:
+            if self._data is None:
+                self._data = self._load()
+                self._start_flusher()
+            return self._data
+
+    def get(self, chat_id):
+        """
+        Returns the wardrobe (read view) of a user, or None if the user has none yet.
+        """
+        chat_id = str(chat_id)
+        with self.lock:
+            view = self._views.get(chat_id)
+            if view is None:
+                delta = self.data().get(chat_id)
+                if delta is None:
+                    return None
+                view = self._views[chat_id] = merge_wardrobe(delta)
+            return view
+
+    def create(self, chat_id, language):
+        """
+        Creates the default wardrobe for a new user. Only the language is stored.
+        """
+        chat_id = str(chat_id)
+        with self.lock:
+            self.data()[chat_id] = {"language": _wardrobe_language(language)}
+            self._views.pop(chat_id, None)
+            self._changed(chat_id)
+            self._dirty.add(chat_id)
+            return self.get(chat_id)
+
+    def put(self, chat_id, user_wardrobe):
+        """
+        Stores (or replaces) the wardrobe of a user and marks it for the next flush.
+        """
+        chat_id = str(chat_id)
+        with self.lock:
+            language = self.data().get(chat_id, {}).get("language", "de")
+            self._data[chat_id] = diff_wardrobe(user_wardrobe, language)
+            self._views[chat_id] = user_wardrobe
+            self._changed(chat_id)
+            self._dirty.add(chat_id)
+
+    def _changed(self, chat_id):
+        self._versions[chat_id] = self._versions.get(chat_id, 0) + 1
+        for listener in self._listeners:
+            listener(chat_id)
+
+    def add_listener(self, callback):
+        with self.lock:
+            self._listeners.append(callback)
+
+    def version(self, chat_id):
+        """
+        Returns the change counter of a user's wardrobe.
+        """
+        with self.lock:
+            return self._versions.get(str(chat_id), 0)
+
+    def mark_dirty(self, chat_id):
+        """
+        Marks a user whose wardrobe was modified in place.
+        """
+        with self.lock:
+            view = self._views.get(str(chat_id))
+            if view is not None:
+                self.put(chat_id, view)
+
+    def replace_all(self, data):
+        """
+        Replaces the data of all users (used by save_wardrobe).
+        Accepts deltas as well as full wardrobes in the old format.
+        """
+        with self.lock:
+            self._data = {chat_id: _migrate_legacy_entry(entry) if isinstance(entry, list) else entry
+                          for chat_id, entry in data.items()}
+            self._views.clear()
+            for chat_id in self._data:
+                self._changed(chat_id)
+            self._dirty.update(self._data.keys())
+            self._start_flusher()
+
+    def flush(self):
+        """
+        Writes the wardrobes to disk if any user changed since the last flush.
+        """
+        with self._flush_lock:
+            with self.lock:
+                if not self._dirty or self._data is None:
+                    return
+                dirty = set(self._dirty)
+                self._dirty.clear()
+                try:
+                    content = json.dumps(self._data, ensure_ascii=False)
+                except Exception:
+                    self._dirty.update(dirty)
+                    raise
+            try:
+                atomic_write_json(self.path, content)
+            except Exception:
+                with self.lock:
+                    self._dirty.update(dirty)
+                raise
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="wardrobe-flush", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[WardrobeStore] Flush failed: {e}")
+
+# Shared wardrobe store, flushed on shutdown
+_store = WardrobeStore()
+atexit.register(_store.flush)
+
+"""
+Load the wardrobes of all users.
+Returns the stored wardrobe deltas as a dictionary (served from the in-memory store).
+"""
+def load_wardrobe():
+    return _store.data()
 
 """
-Save the wardrobe data to wardrobe.json.
+Save the wardrobe data of all users.
+The data is written to wardrobe.json in the background.
 
 ----
 
@@ -174,8 +452,53 @@ Args:
     data: The complete wardrobe dictionary to save.
 """
 def save_wardrobe(data):
-    with open("wardrobe.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    _store.replace_all(data)
+
+"""
+Save the wardrobe of a single user.
+Only marks the user as changed, the file is written in the background.
+
+----
+
+Args:
+    chat_id: The chat id of the user.
+    user_wardrobe: The user's wardrobe (dict).
+"""
+def save_user_wardrobe(chat_id, user_wardrobe):
+    _store.put(chat_id, user_wardrobe)
+
+"""
+Register a callback called with the chat id (str) whenever a user's wardrobe changes.
+Used to drop data derived from a wardrobe, e.g. the outfit tables of packing.py.
+The callback runs while the store is locked, so it must be quick and must not call back into the store.
+
+----
+
+Args:
+    callback: Callable taking the chat id.
+"""
+def on_wardrobe_change(callback):
+    _store.add_listener(callback)
+
+"""
+Get the lock of the wardrobe store.
+Hold it while changing a user's items in place and saving them, so the background flush
+never serializes a half-changed wardrobe.
+"""
+def wardrobe_lock():
+    return _store.lock
+
+"""
+Get the change counter of a user's wardrobe.
+It changes whenever the wardrobe is created or saved, so derived data can be cached per version.
+
+----
+
+Args:
+    chat_id: The chat id of the user.
+"""
+def get_wardrobe_version(chat_id):
+    return _store.version(chat_id)
 
 
 """
@@ -188,13 +511,32 @@ Args:
     chat_id: The chat id of the user.
 """
 def get_or_create_user_wardrobe(chat_id, language="de"):
-    data = load_wardrobe()
-    chat_id_str = str(chat_id)
-    # Create a new wardrobe for the user if not present
-    if chat_id_str not in data:
-        data[chat_id_str] = [get_default_wardrobe(language)]
-        save_wardrobe(data)
-    return data, data[chat_id_str][0]
+    with _store.lock:
+        user_wardrobe = _store.get(chat_id)
+        # Create a new wardrobe for the user if not present
+        if user_wardrobe is None:
+            user_wardrobe = _store.create(chat_id, language)
+        return _store.data(), user_wardrobe
+
+"""
+Get (or create) the wardrobes of many users in one store access, e.g. for all members of a routine slot.
+Returns the users' wardrobes in the order of chat_ids.
+
+----
+
+Args:
+    chat_ids: The chat ids of the users.
+    language: The language of newly created wardrobes.
+"""
+def get_or_create_user_wardrobes(chat_ids, language="de"):
+    with _store.lock:
+        wardrobes = []
+        for chat_id in chat_ids:
+            user_wardrobe = _store.get(chat_id)
+            if user_wardrobe is None:
+                user_wardrobe = _store.create(chat_id, language)
+            wardrobes.append(user_wardrobe)
+        return wardrobes
 
 """
 Add a clothing item to the user's wardrobe.
@@ -212,25 +554,24 @@ Returns:
 def add_clothing(chat_id, category, item, fuzzy_threshold=90, min_temp=10, max_temp=25, prio=3, weather="any"):
     if not category:
         return False, None  # Category is required
-    data, user_wardrobe = get_or_create_user_wardrobe(chat_id)
+    with _store.lock:
+        return _add_clothing(chat_id, category, item, fuzzy_threshold, min_temp, max_temp, prio, weather)
+
+def _add_clothing(chat_id, category, item, fuzzy_threshold, min_temp, max_temp, prio, weather):
+    _, user_wardrobe = get_or_create_user_wardrobe(chat_id)
     existing_items = user_wardrobe.get(category, [])
+    new_item = ClothingItem(item, min_temp, max_temp, prio, weather_mask(weather))
     for i in existing_items:
-        name = i["name"] if isinstance(i, dict) else i
         if fuzzy_threshold >= 100:
             # Exact match (case-insensitive)
-            if item.lower() == name.lower():
-                return False, name  # Already exists (exact match)
+            if new_item.key == i.key:
+                return False, i.name  # Already exists (exact match)
         else:
-            score = fuzz.partial_ratio(item.lower(), name.lower())
+            score = fuzz.partial_ratio(new_item.key, i.key)
             if score >= fuzzy_threshold:
-                return False, name  # Already exists (fuzzy match)
-    # Add as dict if default wardrobe uses dicts
-    if existing_items and isinstance(existing_items[0], dict):
-        user_wardrobe.setdefault(category, []).append({"name": item, "min_temp": min_temp, "max_temp": max_temp, "prio": prio, "weather": weather})
-    else:
-        user_wardrobe.setdefault(category, []).append(item)
-    data[str(chat_id)] = [user_wardrobe]
-    save_wardrobe(data)
+                return False, i.name  # Already exists (fuzzy match)
+    user_wardrobe.setdefault(category, []).append(new_item)
+    save_user_wardrobe(chat_id, user_wardrobe)
     return True, item
 
 """
@@ -248,28 +589,31 @@ Returns:
 def remove_clothing(chat_id, category, item, fuzzy_threshold=90):
     if not category:
         return False, None  # Category is required
-    data, user_wardrobe = get_or_create_user_wardrobe(chat_id)
+    with _store.lock:
+        return _remove_clothing(chat_id, category, item, fuzzy_threshold)
+
+def _remove_clothing(chat_id, category, item, fuzzy_threshold):
+    _, user_wardrobe = get_or_create_user_wardrobe(chat_id)
     found = False
     found_name = None
+    key = normalize_name(item)
     for i in user_wardrobe.get(category, [])[:]:
-        name = i["name"] if isinstance(i, dict) else i
         if fuzzy_threshold >= 100:
             # Exact match (case-insensitive)
-            if item.lower() == name.lower():
+            if key == i.key:
                 user_wardrobe[category].remove(i)
                 found = True
-                found_name = name
+                found_name = i.name
                 break
         else:
-            score = fuzz.partial_ratio(item.lower(), name.lower())
+            score = fuzz.partial_ratio(key, i.key)
             if score >= fuzzy_threshold:
                 user_wardrobe[category].remove(i)
                 found = True
-                found_name = name
+                found_name = i.name
                 break
     if found:
-        data[str(chat_id)] = [user_wardrobe]
-        save_wardrobe(data)
+        save_user_wardrobe(chat_id, user_wardrobe)
         return True, found_name
     return False, None
 
@@ -283,14 +627,100 @@ Args:
     category: The category to search for alternatives.
     exclude_item: The item to exclude from suggestions.
 Returns:
-    A list of alternative items, or None if none are available.
+    A list of alternative item names, or None if none are available.
 """
 def suggest_alternative(chat_id, category, exclude_item):
     _, user_wardrobe = get_or_create_user_wardrobe(chat_id)
-    alternatives = [i for i in user_wardrobe.get(category, []) if i != exclude_item]
+    exclude_key = normalize_name(exclude_item) if exclude_item else None
+    alternatives = [i.name for i in user_wardrobe.get(category, []) if i.key != exclude_key]
     return alternatives if alternatives else None
 
 
+# rapidfuzz score (partial ratio) a category or item mentioned in a message must exceed
+ENTITY_FUZZY_THRESHOLD = 90
+
+class EntityIndex:
+    """
+    Precomputed lookup structures for the categories and items of a language's default wardrobe.
+    Messages are first matched exactly (hash maps and a spaCy PhraseMatcher on the tokenized text only),
+    then fuzzily with rapidfuzz over the cached choice lists.
+    """
+
+    def __init__(self, language, nlp):
+        self.nlp = nlp
+        default = _DEFAULT_WARDROBES[language]
+        self.categories = list(default.keys())
+        self.category_by_key = {cat.lower(): cat for cat in self.categories}
+        self.item_by_key = {}
+        self.item_category = {}
+        for cat, items in default.items():
+            for i in items:
+                self.item_by_key.setdefault(i.name.lower(), i.name)
+                self.item_category.setdefault(i.name.lower(), cat)
+        # Choice lists for the fuzzy fallback, in wardrobe order like the old linear scan
+        self.category_choices = list(self.category_by_key.keys())
+        self.item_choices = list(self.item_by_key.keys())
+        self.matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        self.matcher.add("CATEGORY", [nlp.make_doc(cat) for cat in self.categories])
+        self.matcher.add("ITEM", [nlp.make_doc(name) for name in self.item_by_key.values()])
+        self._category_label = nlp.vocab.strings["CATEGORY"]
+
+    def _exact(self, text):
+        # Longest phrase per label, so "Bermuda Shorts" wins over "Shorts"
+        doc = self.nlp.make_doc(text)
+        best = {}
+        for match_id, start, end in self.matcher(doc):
+            label = "category" if match_id == self._category_label else "item"
+            span = doc[start:end]
+            if label not in best or len(span.text) > len(best[label]):
+                best[label] = span.text
+        category = self.category_by_key.get(best["category"].lower()) if "category" in best else None
+        item = self.item_by_key.get(best["item"].lower()) if "item" in best else None
+        return category, item
+
+    def fuzzy_category(self, query):
+        match = process.extractOne(query, self.category_choices, scorer=fuzz.partial_ratio,
+                                   score_cutoff=ENTITY_FUZZY_THRESHOLD)
+        # Strictly above the threshold, like the old linear scan (scores are floats, so no cutoff of 91)
+        return self.category_by_key[match[0]] if match and match[1] > ENTITY_FUZZY_THRESHOLD else None
+
+    def fuzzy_item(self, query):
+        match = process.extractOne(query, self.item_choices, scorer=fuzz.partial_ratio,
+                                   score_cutoff=ENTITY_FUZZY_THRESHOLD)
+        return self.item_by_key[match[0]] if match and match[1] > ENTITY_FUZZY_THRESHOLD else None
+
+    def match(self, text):
+        """
+        Returns the (category, item) mentioned in a message, each None if not found.
+        If only the item is found, the category is the one the item belongs to.
+        """
+        category, item = self._exact(text)
+        text_lower = text.lower()
+        if category is None:
+            category = self.fuzzy_category(text_lower)
+        if item is None:
+            item = self.fuzzy_item(text_lower)
+        if not category and item:
+            category = self.item_category.get(item.lower())
+        return category, item
+
+_entity_indexes = {}
+
+"""
+Get the entity index of a language, built on first use.
+
+----
+
+Args:
+    language: The language code ("de" or "en").
+"""
+def get_entity_index(language="de"):
+    lang = _wardrobe_language(language)
+    index = _entity_indexes.get(lang)
+    if index is None:
+        index = _entity_indexes[lang] = EntityIndex(lang, nlp_en if lang == "en" else nlp_de)
+    return index
+
 """
 Use spaCy to extract intent and entities (category, item) from the user's message.
 Returns a dict: {'intent': ..., 'category': ..., 'item': ...}
@@ -302,15 +732,7 @@ Args:
     language: The language code ("de" or "en").
 """
 def extract_intent_and_entities(text, language="de"):
-    # Select the appropriate spaCy model based on language
-    if language.lower().startswith("de"):
-        nlp = nlp_de
-    else:
-        nlp = nlp_en
-    doc = nlp(text)
     text_lower = text.lower()
-    # Get the current default wardrobe structure for categories and items
-    default_wardrobe = get_default_wardrobe(language)
     # Detect intent based on keywords
     if language.lower().startswith("de"):
         if any(kw in text_lower for kw in ["habe kein", "habe nicht", "besitze nicht"]):
@@ -331,56 +753,14 @@ def extract_intent_and_entities(text, language="de"):
         else:
             intent = "show"
 
-    # Fuzzy matching helpers
-    def fuzzy_find_best(query, choices, threshold=90):
-        best = None
-        best_score = threshold
-        for c in choices:
-            score = fuzz.partial_ratio(query, c.lower())
-            if score > best_score:
-                best = c
-                best_score = score
-        return best
-
-    # Try to extract item and category using fuzzy matching
-    item = None
-    category = None
-    # Fuzzy match for category
-    category = fuzzy_find_best(text_lower, [cat.lower() for cat in default_wardrobe.keys()])
-    if category:
-        for cat in default_wardrobe.keys():
-            if cat.lower() == category:
-                category = cat
-                break
-    # Fuzzy match for item
-    all_items = []
-    for items in default_wardrobe.values():
-        for i in items:
-            name = i["name"] if isinstance(i, dict) else i
-            all_items.append(name)
-    item = fuzzy_find_best(text_lower, [i.lower() for i in all_items])
-    if item:
-        for i in all_items:
-            if i.lower() == item:
-                item = i
-                break
-    # If category is still None but item is found, try to infer category by best fuzzy match of item in all categories
-    if not category and item:
-        best_cat = None
-        best_score = 85
-        for cat, items in default_wardrobe.items():
-            for i in items:
-                name = i["name"] if isinstance(i, dict) else i
-                score = fuzz.partial_ratio(item.lower(), name.lower())
-                if score > best_score:
-                    best_cat = cat
-                    best_score = score
-        if best_cat:
-            category = best_cat
-    # Try to extract new items (not in default) for add/remove
+    # Extract item and category with the precomputed index (exact phrases first, then fuzzy)
+    index = get_entity_index(language)
+    category, item = index.match(text)
+    # Try to extract new items (not in default) for add/remove, only here the full spaCy parse is needed
     if intent in ["add", "remove"] and not item:
-        for token in doc:
-            if token.pos_ == "NOUN" and fuzzy_find_best(token.text.lower(), [c.lower() for c in default_wardrobe.keys()]) is None:
+        nlp = nlp_de if language.lower().startswith("de") else nlp_en
+        for token in nlp(text):
+            if token.pos_ == "NOUN" and index.fuzzy_category(token.text.lower()) is None:
                 item = token.text
                 break
     return {"intent": intent, "category": category, "item": item}
@@ -448,12 +828,9 @@ def handle_wardrobe(bot, message, text, language):
         else:
             return f"{item} wurde nicht in deiner Kategorie {category} gefunden." if language.lower().startswith("de") else f"{item} was not found in your {category}."
     elif intent == "missing":
-        if not category:
+        if not category and item:
             _, user_wardrobe = get_or_create_user_wardrobe(chat_id)
-            for cat, items in user_wardrobe.items():
-                if item in items:
-                    category = cat
-                    break
+            category, _ = find_item_in_wardrobe(user_wardrobe, item)
         if category:
             remove_clothing(chat_id, category, item)
             alternatives = suggest_alternative(chat_id, category, item)
@@ -467,7 +844,7 @@ def handle_wardrobe(bot, message, text, language):
         _, user_wardrobe = get_or_create_user_wardrobe(chat_id)
         lines = []
         for cat, items in user_wardrobe.items():
-            lines.append(f"{cat}: {', '.join(i['name'] if isinstance(i, dict) else i for i in items)}")
+            lines.append(f"{cat}: {', '.join(i.name for i in items)}")
         return msg_wardrobe + "\n".join(lines)
     else:
         return f"Wardrobe-Feature: Anfrage erhalten. (Intent: {intent}, Kategorie: {category}, Item: {item})"
@@ -476,22 +853,21 @@ def find_item_in_wardrobe(user_wardrobe, item):
     """
     Returns (category, name) if item exists in any category, else (None, None).
     """
+    key = normalize_name(item)
     for cat, items in user_wardrobe.items():
         for i in items:
-            name = i["name"] if isinstance(i, dict) else i
-            if item.lower() == name.lower():
-                return cat, name
+            if i.key == key:
+                return cat, i.name
     return None, None
 
 def remove_item_from_all_categories(chat_id, item):
     """
     Removes the item from all categories for the user. Returns (True, category) if found and removed, else (False, None).
     """
-    data, user_wardrobe = get_or_create_user_wardrobe(chat_id)
-    for cat, items in user_wardrobe.items():
-        for i in items:
-            name = i["name"] if isinstance(i, dict) else i
-            if item.lower() == name.lower():
-                remove_clothing(chat_id, cat, item, fuzzy_threshold=100)
-                return True, cat
+    with _store.lock:
+        _, user_wardrobe = get_or_create_user_wardrobe(chat_id)
+        cat, _ = find_item_in_wardrobe(user_wardrobe, item)
+        if cat:
+            remove_clothing(chat_id, cat, item, fuzzy_threshold=100)
+            return True, cat
     return False, None
\ No newline at end of file
@@ -107,13 +107,15 @@ def extract_forecast_day(text, language):
 
     return None
 
-def extract_location(text, language):
+def extract_location(text, language, doc=None):
     """
     Extracts a location (city/region) from the given input text using spaCy NER.
     Accepts both LOC and GPE labels for better coverage.
+    An already parsed doc of the text is used instead of parsing it again.
     """
-    nlp = nlp_de if language == "de" else nlp_en
-    doc = nlp(text)
+    if doc is None:
+        nlp = nlp_de if language == "de" else nlp_en
+        doc = nlp(text)
 
     for ent in doc.ents:
         if ent.label_ in ("LOC", "GPE"):
@@ -122,67 +124,113 @@ def extract_location(text, language):
 
     return None
 
-def get_weather(city, language, forecast_day):
+GEOCODE_URL = "http://api.openweathermap.org/geo/1.0/direct"
+# Places the geocoding API does not resolve well: name -> (lat, lon, display name)
+FIXED_LOCATIONS = {
+    "eselsberg": (48.4037, 9.9563, "Eselsberg")
+}
+
+def geocode_city(city, language):
     """
-    Fetches weather data (current or forecast) for a given city.
-    Depending on whether a forecast day index is provided, the function retrieves the current weather or the forecast.
+    Resolves a city name to its coordinates and localized name.
 
     Args:
-        city (str): The name of the city to get weather data for
+        city (str): The name of the city
         language (str): The language code ('de' for German, 'en' for English)
-        forecast_day (int or None): The forecast day index (0 = today, 1 = tomorrow, 2 = overmorrow), or None for current weather
 
     Returns:
-        dict or None: A dictionary with formatted weather text and location info, or None if the API request failed
+        tuple or None: (lat, lon, city_name), or None if the city could not be found
     """
-
     # Fix for Eselsberg: use direct coordinates for Ulm-Eselsberg
-    if city.lower() == "eselsberg":
-        lat = 48.4037
-        lon = 9.9563
-        city_name = "Eselsberg"
+    if city.lower() in FIXED_LOCATIONS:
+        lat, lon, city_name = FIXED_LOCATIONS[city.lower()]
     else:
         # Step 1: Get latitude/longitude from city name
-        geo_url = "http://api.openweathermap.org/geo/1.0/direct"
         geo_params = {
             "q": city,
             "limit": 1,
             "appid": OPEN_API_KEY
         }
 
-        geo_response = requests.get(geo_url, params=geo_params)
+        geo_response = requests.get(GEOCODE_URL, params=geo_params)
         if geo_response.status_code != 200 or not geo_response.json():
             return None
 
         print(geo_response.json())
+        lat, lon, city_name = parse_geocode_result(geo_response.json(), language)
 
-        location = geo_response.json()[0]
-        lat = location['lat']
-        lon = location['lon']
-        
-        # Use localized name if available, otherwise fallback to default name
-        local_names = location.get('local_names', {})
-        if language == 'de' and 'de' in local_names:
-            city_name = local_names['de']
-        elif language == 'en' and 'en' in local_names:
-            city_name = local_names['en']
-        else:
-            city_name = location['name']
+    return lat, lon, city_name
+
+def parse_geocode_result(result, language):
+    """
+    Extracts (lat, lon, city_name) from the first result of the geocoding API,
+    using the localized name if available, otherwise the default name.
+    """
+    location = result[0]
+    local_names = location.get('local_names', {})
+    if language == 'de' and 'de' in local_names:
+        city_name = local_names['de']
+    elif language == 'en' and 'en' in local_names:
+        city_name = local_names['en']
+    else:
+        city_name = location['name']
+    return location['lat'], location['lon'], city_name
 
+def get_weather(city, language, forecast_day):
+    """
+    Fetches weather data (current or forecast) for a given city.
+    Depending on whether a forecast day index is provided, the function retrieves the current weather or the forecast.
+
+    Args:
+        city (str): The name of the city to get weather data for
+        language (str): The language code ('de' for German, 'en' for English)
+        forecast_day (int or None): The forecast day index (0 = today, 1 = tomorrow, 2 = overmorrow), or None for current weather
+
+    Returns:
+        dict or None: A dictionary with formatted weather text and location info, or None if the API request failed
+    """
+
+    coordinates = geocode_city(city, language)
+    if coordinates is None:
+        return None
+    lat, lon, city_name = coordinates
+
+    url, params = weather_request(lat, lon, language, forecast_day)
+    response = requests.get(url, params=params)
+    if response.status_code != 200:
+        return None
+    return format_weather(response.json(), city_name, language, forecast_day)
+
+def weather_request(lat, lon, language, forecast_day):
+    """
+    Returns the URL and query parameters of the current weather (forecast_day None) or forecast request.
+    """
     if forecast_day is None:
-        # Current
         url = "https://api.weatherapi.com/v1/current.json"
         params = {
             'key': WEATHER_API_KEY,
             'q': f"{lat},{lon}",
             'lang': language
         }
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            return None
+    else:
+        url = "https://api.weatherapi.com/v1/forecast.json"
+        params = {
+            'key': WEATHER_API_KEY,
+            'q': f"{lat},{lon}",
+            'lang': language,
+            'days': forecast_day + 1
+        }
+    return url, params
 
-        data = response.json()
+def format_weather(data, city_name, language, forecast_day):
+    """
+    Formats the response of the weather API as the result of get_weather.
 
+    Returns:
+        dict: A dictionary with formatted weather text and location info
+    """
+    if forecast_day is None:
+        # Current
         if language == "de":
             return {
                 'location': city_name,
@@ -202,18 +250,6 @@ def get_weather(city, language, forecast_day):
 
     else:
         # Forecast
-        url = "https://api.weatherapi.com/v1/forecast.json"
-        params = {
-            'key': WEATHER_API_KEY,
-            'q': f"{lat},{lon}",
-            'lang': language,
-            'days': forecast_day + 1
-        }
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            return None
-
-        data = response.json()
         forecast = data['forecast']['forecastday'][forecast_day]['day']
         condition = forecast['condition']['text']
         avg_temp = forecast['avgtemp_c']
@@ -247,6 +283,116 @@ def get_weather(city, language, forecast_day):
                         f"{condition}, avg {avg_temp}°C (min {min_temp}°C / max {max_temp}°C)"
             }
 
+async def geocode_city_async(session, city, language):
+    """
+    Async version of geocode_city for the asyncio runtime (see async_bot.py).
+
+    Args:
+        session (aiohttp.ClientSession): The shared HTTP session
+    """
+    if city.lower() in FIXED_LOCATIONS:
+        return FIXED_LOCATIONS[city.lower()]
+    geo_params = {
+        "q": city,
+        "limit": 1,
+        "appid": OPEN_API_KEY
+    }
+    async with session.get(GEOCODE_URL, params=geo_params) as geo_response:
+        if geo_response.status != 200:
+            return None
+        result = await geo_response.json()
+    if not result:
+        return None
+    return parse_geocode_result(result, language)
+
+async def get_weather_async(session, city, language, forecast_day):
+    """
+    Async version of get_weather for the asyncio runtime (see async_bot.py).
+
+    Args:
+        session (aiohttp.ClientSession): The shared HTTP session
+        city (str): The name of the city to get weather data for
+        language (str): The language code ('de' for German, 'en' for English)
+        forecast_day (int or None): The forecast day index, or None for current weather
+
+    Returns:
+        dict or None: Same as get_weather
+    """
+    coordinates = await geocode_city_async(session, city, language)
+    if coordinates is None:
+        return None
+    lat, lon, city_name = coordinates
+    url, params = weather_request(lat, lon, language, forecast_day)
+    async with session.get(url, params=params) as response:
+        if response.status != 200:
+            return None
+        data = await response.json()
+    return format_weather(data, city_name, language, forecast_day)
+
+# Maximum number of forecast days of the weather API
+MAX_FORECAST_DAYS = 14
+
+def get_forecast_days(city, language, start_date, end_date, hourly=True, now=None):
+    """
+    Fetches a structured forecast for every day of a date range with a single forecast request.
+    Days beyond the forecast horizon of the API (MAX_FORECAST_DAYS) are left out.
+
+    Args:
+        city (str): The name of the city
+        language (str): The language code ('de' for German, 'en' for English)
+        start_date (date): First day
+        end_date (date): Last day (inclusive)
+        hourly (bool): Whether to include the hourly temperatures and conditions
+        now (datetime): The time the forecast window starts from (default: the current time)
+
+    Returns:
+        dict or None: {'location': city_name, 'days': [{'date', 'min_temp', 'max_temp', 'avg_temp', 'condition',
+                      'hours': [{'hour', 'temp', 'condition'}]}]}, or None if the API request failed
+    """
+    today = (now or datetime.now()).date()
+    days_needed = (end_date - today).days + 1
+    if days_needed < 1:
+        return None
+
+    coordinates = geocode_city(city, language)
+    if coordinates is None:
+        return None
+    lat, lon, city_name = coordinates
+
+    url = "https://api.weatherapi.com/v1/forecast.json"
+    params = {
+        'key': WEATHER_API_KEY,
+        'q': f"{lat},{lon}",
+        'lang': language,
+        'days': min(days_needed, MAX_FORECAST_DAYS)
+    }
+    response = requests.get(url, params=params)
+    if response.status_code != 200:
+        return None
+
+    days = []
+    for forecast_day in response.json()['forecast']['forecastday']:
+        date = datetime.strptime(forecast_day['date'], "%Y-%m-%d").date()
+        if not start_date <= date <= end_date:
+            continue
+        day = forecast_day['day']
+        days.append({
+            'date': date,
+            'min_temp': day['mintemp_c'],
+            'max_temp': day['maxtemp_c'],
+            'avg_temp': day['avgtemp_c'],
+            'condition': day['condition']['text'],
+            'hours': [
+                {
+                    'hour': int(hour['time'][-5:-3]),
+                    'temp': hour['temp_c'],
+                    'condition': hour['condition']['text']
+                }
+                for hour in forecast_day.get('hour', [])
+            ] if hourly else []
+        })
+    return {'location': city_name, 'days': days}
+
 def handle_weather(bot, message, text, language):
     """
         Handle the weather command.
@@ -260,11 +406,28 @@ def handle_weather(bot, message, text, language):
             language (str): The detected language code ('de' or 'en')
     """
     print(f"handle_weather called with text: {text}, language: {language}")
-    location = extract_location(text, language)
+    return weather_reply(text, language, extract_location(text, language))
+
+def weather_reply(text, language, location):
+    """
+        Answers a weather request for the location named in it (None if there is none).
+    """
+    forecast_day, error = check_weather_request(text, language, location)
+    if error:
+        return error
+    return format_weather_reply(get_weather(location, language, forecast_day), location)
+
+def check_weather_request(text, language, location):
+    """
+        Extracts the forecast day of a weather request and checks the request.
+
+        Returns:
+            tuple: (forecast_day, error message or None)
+    """
     forecast_day = extract_forecast_day(text, language)
 
     if forecast_day is not None and forecast_day > 2:
-        return (
+        return forecast_day, (
             "⚠️ Die Wettervorhersage ist nur für bis zu 3 Tage im Voraus verfügbar."
             if language == "de"
             else "⚠️ Forecast is only available for up to 3 days ahead."
@@ -272,10 +435,15 @@ def handle_weather(bot, message, text, language):
 
     if not location:
         if language == "de":
-            return "❌ I could not detect a location. Please try again."
+            return forecast_day, "❌ I could not detect a location. Please try again."
         else:
-            return "❌ I couldn't detect a location. Please try again."
-    weather = get_weather(location, language, forecast_day)
+            return forecast_day, "❌ I couldn't detect a location. Please try again."
+    return forecast_day, None
+
+def format_weather_reply(weather, location):
+    """
+        Returns the reply text for a get_weather result.
+    """
     if weather:
         return weather['text']
     else:
@@ -0,0 +1,108 @@
+import hmac
+import json
+import os
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import telebot
+
+# Webhook settings, taken from the environment (see telegram_bot.main)
+# Public HTTPS URL Telegram posts the updates to, e.g. https://bot.example.com/telegram
+WEBHOOK_URL = os.environ.get("WNW_WEBHOOK_URL", "")
+# Secret Telegram sends in every request (X-Telegram-Bot-Api-Secret-Token), 1-256 characters A-Z, a-z, 0-9, _ and -.
+# Required in webhook mode: without it anyone who knows the URL could post forged updates
+WEBHOOK_SECRET = os.environ.get("WNW_WEBHOOK_SECRET", "")
+# Local address of the HTTP server (usually behind a TLS-terminating reverse proxy)
+WEBHOOK_HOST = os.environ.get("WNW_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.environ.get("WNW_WEBHOOK_PORT", "8443"))
+# Largest request body accepted (Telegram updates are far smaller)
+WEBHOOK_MAX_BODY = 1024 * 1024
+
+SECRET_HEADER = "HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN"
+
+
+def create_app(bot, secret=WEBHOOK_SECRET, path=None):
+    """
+    Creates the WSGI application receiving the Telegram updates.
+
+    Requests without the secret token are rejected; valid updates are handed to bot.process_new_updates,
+    which queues them on the bot's dispatcher, so Telegram gets its answer without waiting for the handlers.
+
+    Args:
+        bot: The telebot instance with the registered handlers.
+        secret (str): The secret token set with set_webhook, required (an open endpoint would accept forged updates).
+        path (str): Only accept updates on this path (None accepts every path).
+
+    Returns:
+        callable: WSGI application, also usable with an external server (e.g. gunicorn).
+    """
+    if not secret:
+        raise ValueError("WNW_WEBHOOK_SECRET must be set in webhook mode")
+
+    def respond(start_response, status):
+        start_response(status, [("Content-Type", "text/plain"), ("Content-Length", str(len(status)))])
+        return [status.encode()]
+
+    def app(environ, start_response):
+        if path is not None and environ.get("PATH_INFO") != path:
+            return respond(start_response, "404 Not Found")
+        if environ.get("REQUEST_METHOD") != "POST":
+            return respond(start_response, "405 Method Not Allowed")
+        if not hmac.compare_digest(environ.get(SECRET_HEADER, ""), secret):
+            return respond(start_response, "403 Forbidden")
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length <= 0 or length > WEBHOOK_MAX_BODY:
+            return respond(start_response, "400 Bad Request")
+        try:
+            update = telebot.types.Update.de_json(json.loads(environ["wsgi.input"].read(length)))
+        except Exception as e:
+            print(f"[webhook] Invalid update: {e}")
+            return respond(start_response, "400 Bad Request")
+        bot.process_new_updates([update])
+        return respond(start_response, "200 OK")
+
+    return app
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(app):
+    server = _ThreadingWSGIServer((WEBHOOK_HOST, WEBHOOK_PORT), _QuietHandler)
+    server.set_app(app)
+    server.serve_forever()
+
+
+def run(bot, url=WEBHOOK_URL, secret=WEBHOOK_SECRET, on_start=None):
+    """
+    Registers the webhook with Telegram and serves the updates until interrupted.
+    The server runs in this one process: the stores, the routine slots and the
+    per-chat ordering of updates are process-local.
+
+    Args:
+        bot: The telebot instance with the registered handlers.
+        url (str): Public URL of the webhook, its path is the path the server accepts.
+        secret (str): The secret token Telegram sends with every update.
+        on_start: Optional callable run before serving, used to start the background services.
+    """
+    if not url:
+        raise ValueError("WNW_WEBHOOK_URL must be set in webhook mode")
+    if not secret:
+        raise ValueError("WNW_WEBHOOK_SECRET must be set in webhook mode")
+    bot.remove_webhook()
+    bot.set_webhook(url=url, secret_token=secret)
+    app = create_app(bot, secret, path=urlparse(url).path or "/")
+    print(f"[webhook] Listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+    if on_start:
+        on_start()
+    _serve(app)